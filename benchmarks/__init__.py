@@ -0,0 +1,3 @@
+# SPDX-FileCopyrightText: 2024-present Anfeng Li <anfeng.li@cern.ch>
+#
+# SPDX-License-Identifier: MIT
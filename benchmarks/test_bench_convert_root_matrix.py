@@ -0,0 +1,23 @@
+# SPDX-FileCopyrightText: 2024-present Anfeng Li <anfeng.li@cern.ch>
+#
+# SPDX-License-Identifier: MIT
+
+import numpy as np
+import pytest
+import ROOT
+
+from src.data_analysis_helper.root import convert_root_matrix
+
+
+@pytest.mark.parametrize("size", [10, 100, 1000])
+def test_convert_root_matrix(benchmark, size):
+    matrix = ROOT.TMatrixD(size, size)
+    matrix.SetMatrixArray(np.random.default_rng(0).random(size * size))
+    benchmark(convert_root_matrix, matrix)
+
+
+@pytest.mark.parametrize("size", [10, 100, 1000])
+def test_convert_root_matrix_sym(benchmark, size):
+    matrix = ROOT.TMatrixDSym(size)
+    matrix.UnitMatrix()
+    benchmark(convert_root_matrix, matrix)
@@ -0,0 +1,26 @@
+# SPDX-FileCopyrightText: 2024-present Anfeng Li <anfeng.li@cern.ch>
+#
+# SPDX-License-Identifier: MIT
+
+import matplotlib
+import numpy as np
+import pytest
+
+from src.data_analysis_helper.plot import histplot
+
+matplotlib.use("Agg")
+
+
+def plot(x, weights):
+    import matplotlib.pyplot as plt
+
+    histplot(x, bins=100, xlabel="x", weights=weights)
+    plt.close("all")
+
+
+@pytest.mark.parametrize("size", [10**4, 10**6, 10**7])
+def test_histplot(benchmark, size):
+    rng = np.random.default_rng(42)
+    x = rng.normal(0, 1, size)
+    weights = rng.uniform(0.5, 1.5, size)
+    benchmark.pedantic(plot, args=(x, weights), rounds=3)
@@ -0,0 +1,28 @@
+# SPDX-FileCopyrightText: 2024-present Anfeng Li <anfeng.li@cern.ch>
+#
+# SPDX-License-Identifier: MIT
+
+import subprocess
+import sys
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "src.data_analysis_helper",
+        "src.data_analysis_helper.stats",
+        "src.data_analysis_helper.plot",
+        "src.data_analysis_helper.expr",
+        "src.data_analysis_helper.root",
+    ],
+)
+def test_import_time(benchmark, module):
+    # in a fresh interpreter, so that nothing is cached in sys.modules
+    benchmark.pedantic(
+        subprocess.run,
+        args=([sys.executable, "-c", f"import {module}"],),
+        kwargs={"check": True},
+        rounds=3,
+    )
@@ -0,0 +1,49 @@
+# SPDX-FileCopyrightText: 2024-present Anfeng Li <anfeng.li@cern.ch>
+#
+# SPDX-License-Identifier: MIT
+
+import numpy as np
+import pytest
+
+from src.data_analysis_helper.stats import kstest, two_sample_test
+
+
+def make_samples(size: int):
+    rng = np.random.default_rng(42)
+    return (
+        rng.normal(0, 1, size),
+        rng.normal(0.1, 1, size),
+        rng.uniform(0.5, 1.5, size),
+        rng.uniform(0.5, 1.5, size),
+    )
+
+
+@pytest.mark.parametrize("size", [10**3, 10**4, 10**5])
+def test_kstest_sample_size(benchmark, size):
+    data1, data2, weights1, weights2 = make_samples(size)
+    benchmark.pedantic(kstest, args=(data1, data2, weights1, weights2, 100), rounds=3)
+
+
+@pytest.mark.parametrize("n_permutations", [100, 1000])
+def test_kstest_n_permutations(benchmark, n_permutations):
+    data1, data2, weights1, weights2 = make_samples(10**3)
+    benchmark.pedantic(
+        kstest, args=(data1, data2, weights1, weights2, n_permutations), rounds=3
+    )
+
+
+@pytest.mark.parametrize("method", ["asymptotic", "sequential"])
+def test_kstest_method(benchmark, method):
+    data1, data2, weights1, weights2 = make_samples(10**4)
+    benchmark(kstest, data1, data2, weights1, weights2, 1000, method=method)
+
+
+@pytest.mark.parametrize("statistics", [["ks"], ["ks", "cvm", "ad", "chi2"]])
+def test_two_sample_test_statistics(benchmark, statistics):
+    data1, data2, weights1, weights2 = make_samples(10**4)
+    benchmark.pedantic(
+        two_sample_test,
+        args=(data1, data2, weights1, weights2, 100),
+        kwargs={"statistics": statistics},
+        rounds=3,
+    )
@@ -0,0 +1,68 @@
+# SPDX-FileCopyrightText: 2024-present Anfeng Li <anfeng.li@cern.ch>
+#
+# SPDX-License-Identifier: MIT
+
+import pytest
+import ROOT
+
+from src.data_analysis_helper.root import RepeatedFit
+
+
+def make_model(nobservables: int, nentries: int):
+    # product of independent Gaussians, with 2 parameters per observable
+    ROOT.RooRandom.randomGenerator().SetSeed(1)
+    variables = []
+    pdfs = []
+    for i in range(nobservables):
+        x = ROOT.RooRealVar(f"x{i}", f"x{i}", -5, 5)
+        mean = ROOT.RooRealVar(f"mean{i}", f"mean{i}", 0, -3, 3)
+        sigma = ROOT.RooRealVar(f"sigma{i}", f"sigma{i}", 1, 0.5, 3)
+        pdfs.append(ROOT.RooGaussian(f"gauss{i}", f"gauss{i}", x, mean, sigma))
+        variables += [x, mean, sigma]
+    model = ROOT.RooProdPdf("model", "model", pdfs)
+    data = model.generate([variables[3 * i] for i in range(nobservables)], nentries)
+    # keep the Python proxies of the components alive with the model
+    model._components = variables + pdfs
+    return model, data
+
+
+def run_repeated_fit(model, data, num_fits, **fit_options):
+    repeated_fit = RepeatedFit(
+        model=model,
+        data=data,
+        num_fits=num_fits,
+        random_seed=0,
+        print_func=lambda *args, **kwargs: None,
+    )
+    repeated_fit.do_repeated_fit(PrintLevel=-1, **fit_options)
+    return repeated_fit
+
+
+@pytest.mark.parametrize("num_fits", [4, 16])
+def test_repeatedfit_num_fits(benchmark, num_fits):
+    model, data = make_model(1, 1000)
+    benchmark.pedantic(run_repeated_fit, args=(model, data, num_fits), rounds=3)
+
+
+@pytest.mark.parametrize("nobservables", [1, 5, 10])
+def test_repeatedfit_num_parameters(benchmark, nobservables):
+    model, data = make_model(nobservables, 1000)
+    benchmark.pedantic(run_repeated_fit, args=(model, data, 4), rounds=3)
+
+
+@pytest.mark.parametrize("nentries", [10**3, 10**4, 10**5])
+def test_repeatedfit_dataset_size(benchmark, nentries):
+    model, data = make_model(1, nentries)
+    benchmark.pedantic(run_repeated_fit, args=(model, data, 4), rounds=3)
+
+
+@pytest.mark.parametrize("eval_backend", ["cpu", "legacy"])
+@pytest.mark.parametrize("reuse_nll", [False, True])
+def test_repeatedfit_reuse_nll(benchmark, reuse_nll, eval_backend):
+    model, data = make_model(1, 10**5)
+    benchmark.pedantic(
+        run_repeated_fit,
+        args=(model, data, 8),
+        kwargs={"reuse_nll": reuse_nll, "EvalBackend": eval_backend},
+        rounds=3,
+    )
@@ -2,10 +2,168 @@
 #
 # SPDX-License-Identifier: MIT
 
-import subprocess
+import atexit
+import io
+import logging
+import os
+import queue
+import sys
+import threading
 
+try:
+    import ctypes
 
-def print_func(string="", end="\n"):
-    if end is None:
-        end = ""
-    subprocess.run(f'echo -n "{string}{end}"', shell=True)
+    _libc = ctypes.CDLL(None)
+except (ImportError, OSError, TypeError):
+    _libc = None
+
+
+def _flush_c_stdout() -> None:
+    # ROOT/Minuit write through C stdio (std::cout is synced with it by default),
+    # so flush it before writing ourselves to keep the output in order.
+    if _libc is not None:
+        _libc.fflush(None)
+
+
+class OutputSink:
+    """
+    In-process replacement of print(), with buffering, log levels and optional
+    asynchronous writing.
+
+    target can be None (standard output), a file path (opened in append mode), a
+    file-like object or a logging.Logger. Writing to standard output is unbuffered by
+    default so that the output stays in order with the output of ROOT.
+    """
+
+    def __init__(
+        self,
+        target=None,
+        *,
+        level: int = logging.INFO,
+        buffer_size: int | None = None,
+        asynchronous: bool = False,
+    ):
+        self.level = level
+        self.buffer_size = (
+            buffer_size if buffer_size is not None else (0 if target is None else 65536)
+        )
+        self._target = target
+        self._asynchronous = asynchronous
+        if isinstance(target, (str, os.PathLike)):
+            self._file = open(target, "a")
+        else:
+            self._file = target
+        self._buffer: list[str] = []
+        self._buffered_size = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._queue = None
+        if asynchronous:
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._consume_queue, daemon=True)
+            self._thread.start()
+
+        atexit.register(self.close)
+
+    def __call__(self, string="", end="\n", *, level: int = logging.INFO) -> None:
+        if level < self.level:
+            return
+        if end is None:
+            end = ""
+        text = f"{string}{end}"
+
+        if isinstance(self._target, logging.Logger):
+            self._dispatch((level, text))
+            return
+
+        with self._lock:
+            self._buffer.append(text)
+            self._buffered_size += len(text)
+            if self._buffered_size < self.buffer_size:
+                return
+            text = "".join(self._buffer)
+            self._buffer = []
+            self._buffered_size = 0
+        self._dispatch(text)
+
+    def flush(self) -> None:
+        with self._lock:
+            text = "".join(self._buffer)
+            self._buffer = []
+            self._buffered_size = 0
+        if text:
+            self._dispatch(text)
+        if self._queue is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        if self._queue is not None:
+            self._queue.put(None)
+            self._thread.join()
+        if isinstance(self._target, (str, os.PathLike)):
+            self._file.close()
+        atexit.unregister(self.close)
+
+    def __reduce__(self):
+        # recreate the sink in other processes (e.g. workers of RepeatedFit)
+        return (
+            _make_output_sink,
+            (
+                self._target,
+                self.level,
+                self.buffer_size,
+                self._asynchronous,
+            ),
+        )
+
+    def _dispatch(self, item) -> None:
+        if self._queue is not None:
+            self._queue.put(item)
+        else:
+            self._write(item)
+
+    def _consume_queue(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(item)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, item) -> None:
+        if isinstance(self._target, logging.Logger):
+            level, text = item
+            self._target.log(level, text.rstrip("\n"))
+        elif self._file is not None:
+            self._file.write(item)
+            self._file.flush()
+        else:
+            stdout = sys.stdout
+            try:
+                fd = stdout.fileno()
+            except (AttributeError, OSError, io.UnsupportedOperation):
+                # e.g. Jupyter or pytest capturing, which replace sys.stdout
+                stdout.write(item)
+                stdout.flush()
+                return
+            stdout.flush()
+            _flush_c_stdout()
+            data = item.encode()
+            while data:
+                data = data[os.write(fd, data) :]
+
+
+def _make_output_sink(target, level, buffer_size, asynchronous) -> OutputSink:
+    return OutputSink(
+        target, level=level, buffer_size=buffer_size, asynchronous=asynchronous
+    )
+
+
+print_func = OutputSink()
@@ -2,6 +2,46 @@
 #
 # SPDX-License-Identifier: MIT
 
+from collections.abc import Callable, Mapping
+
+
+def _resolve_suffix_PxPyPzE(suffix_PxPyPzE: str | list[str]) -> list[str]:
+    if suffix_PxPyPzE == "PXPYPZPE":
+        return ["_PX", "_PY", "_PZ", "_PE"]
+    elif suffix_PxPyPzE == "PXPYPZE":
+        return ["_PX", "_PY", "_PZ", "_E"]
+    elif suffix_PxPyPzE == "TRUEP":
+        return ["_TRUEP_X", "_TRUEP_Y", "_TRUEP_Z", "_TRUEP_E"]
+    else:
+        return suffix_PxPyPzE
+
+
+def _resolve_suffix_PxPyPzM(suffix_PxPyPzM: str | list[str]) -> list[str]:
+    if suffix_PxPyPzM == "PXPYPZM":
+        return ["_PX", "_PY", "_PZ", "_M"]
+    elif suffix_PxPyPzM == "TRUEP":
+        return ["_TRUEP_X", "_TRUEP_Y", "_TRUEP_Z", "_M"]
+    else:
+        return suffix_PxPyPzM
+
+
+def _resolve_suffix_PxPyPz(suffix_PxPyPz: str | list[str]) -> list[str]:
+    if suffix_PxPyPz == "PXPYPZ":
+        return ["_PX", "_PY", "_PZ"]
+    elif suffix_PxPyPz == "TRUEP":
+        return ["_TRUEP_X", "_TRUEP_Y", "_TRUEP_Z"]
+    else:
+        return suffix_PxPyPz
+
+
+def _get_convention_tag(convention: str | list[str], default: str) -> str:
+    # distinguishes the names of quantities built from non-default columns, e.g.
+    # "_TRUEP" for the true momenta; empty for the default convention
+    if convention == default:
+        return ""
+    text = convention if isinstance(convention, str) else "".join(convention)
+    return "_" + "".join(char if char.isalnum() else "_" for char in text).strip("_")
+
 
 def get_invariant_mass_expression(
     prefix: list[str],
@@ -10,12 +50,7 @@ def get_invariant_mass_expression(
     suffix: str = "",
     squared: bool = False,
 ) -> str:
-    if suffix_PxPyPzE == "PXPYPZPE":
-        suffix_PxPyPzE = ["_PX", "_PY", "_PZ", "_PE"]
-    elif suffix_PxPyPzE == "PXPYPZE":
-        suffix_PxPyPzE = ["_PX", "_PY", "_PZ", "_E"]
-    elif suffix_PxPyPzE == "TRUEP":
-        suffix_PxPyPzE = ["_TRUEP_X", "_TRUEP_Y", "_TRUEP_Z", "_TRUEP_E"]
+    suffix_PxPyPzE = _resolve_suffix_PxPyPzE(suffix_PxPyPzE)
 
     sum_of_E = f'({" + ".join([pre + suffix_PxPyPzE[3] + suffix for pre in prefix])})'
     sum_of_PX = f'({" + ".join([pre + suffix_PxPyPzE[0] + suffix for pre in prefix])})'
@@ -35,12 +70,7 @@ def get_pe_expression(
     suffix_PxPyPzM: str | list[str] = "PXPYPZM",
     suffix: str = "",
 ) -> str:
-    if suffix_PxPyPzM == "PXPYPZM":
-        suffix_PxPyPzM_list = ["_PX", "_PY", "_PZ", "_M"]
-    elif suffix_PxPyPzM == "TRUEP":
-        suffix_PxPyPzM_list = ["_TRUEP_X", "_TRUEP_Y", "_TRUEP_Z", "_M"]
-    else:
-        suffix_PxPyPzM_list = suffix_PxPyPzM
+    suffix_PxPyPzM_list = _resolve_suffix_PxPyPzM(suffix_PxPyPzM)
     if mass_hypothesis is not None:
         return f"sqrt(pow({prefix}{suffix_PxPyPzM_list[0]}{suffix}, 2) + pow({prefix}{suffix_PxPyPzM_list[1]}{suffix}, 2) + pow({prefix}{suffix_PxPyPzM_list[2]}{suffix}, 2) + {mass_hypothesis} * {mass_hypothesis})"
     else:
@@ -50,12 +80,7 @@ def get_pe_expression(
 def get_p_expression(
     prefix: str, *, suffix_PxPyPz: str | list[str] = "PXPYPZ", suffix: str = ""
 ) -> str:
-    if suffix_PxPyPz == "PXPYPZ":
-        suffix_PxPyPz_list = ["_PX", "_PY", "_PZ"]
-    elif suffix_PxPyPz == "TRUEP":
-        suffix_PxPyPz_list = ["_TRUEP_X", "_TRUEP_Y", "_TRUEP_Z"]
-    else:
-        suffix_PxPyPz_list = suffix_PxPyPz
+    suffix_PxPyPz_list = _resolve_suffix_PxPyPz(suffix_PxPyPz)
     return f"sqrt(pow({prefix}{suffix_PxPyPz_list[0]}{suffix}, 2) + pow({prefix}{suffix_PxPyPz_list[1]}{suffix}, 2) + pow({prefix}{suffix_PxPyPz_list[2]}{suffix}, 2))"
 
 
@@ -68,3 +93,486 @@ def get_clone_rejection_expression(prefixes: list[str], threshold: float | str)
             angle = f"acos(({prefixes[i]}_PX * {prefixes[j]}_PX + {prefixes[i]}_PY * {prefixes[j]}_PY + {prefixes[i]}_PZ * {prefixes[j]}_PZ) / {p1} / {p2})"
             expressions.append(f"(abs({angle}) > {threshold})")
     return " && ".join(expressions)
+
+
+# The get_*_function variants below evaluate the same quantities as the
+# get_*_expression builders on a mapping of column names to arrays (e.g. the dict
+# returned by uproot's arrays(library="np") or a pandas DataFrame). Each returned
+# callable evaluates in one vectorized pass and reuses its output buffers instead
+# of allocating a temporary array for every intermediate term.
+
+
+def _get_column(columns: Mapping, name: str):
+    # converts (e.g. float32 ntuple columns) to float64; each function reads every
+    # column only once per call, so the conversion is not repeated
+    import numpy as np
+
+    return np.asarray(columns[name], dtype=np.float64)
+
+
+def _get_column_or_value(columns: Mapping, value: float | str):
+    # strings are column names, or numbers as they would be written in a formula
+    if isinstance(value, str):
+        if value in columns:
+            return _get_column(columns, value)
+        return float(value)
+    return value
+
+
+def get_invariant_mass_function(
+    prefix: list[str],
+    *,
+    suffix_PxPyPzE: str | list[str] = "PXPYPZPE",
+    suffix: str = "",
+    squared: bool = False,
+) -> Callable:
+    suffix_PxPyPzE = _resolve_suffix_PxPyPzE(suffix_PxPyPzE)
+    names = [[pre + suffix_PxPyPzE[k] + suffix for pre in prefix] for k in range(4)]
+
+    def invariant_mass(columns: Mapping):
+        import numpy as np
+
+        # E component first, then subtract the momentum components one by one
+        result = np.array(_get_column(columns, names[3][0]))
+        for name in names[3][1:]:
+            np.add(result, _get_column(columns, name), out=result)
+        np.multiply(result, result, out=result)
+        component = np.empty_like(result)
+        for k in range(3):
+            np.copyto(component, _get_column(columns, names[k][0]))
+            for name in names[k][1:]:
+                np.add(component, _get_column(columns, name), out=component)
+            np.multiply(component, component, out=component)
+            np.subtract(result, component, out=result)
+        if not squared:
+            with np.errstate(invalid="ignore"):
+                np.sqrt(result, out=result)
+        return result
+
+    return invariant_mass
+
+
+def get_pe_function(
+    prefix: str,
+    *,
+    mass_hypothesis: float | str | None = None,
+    suffix_PxPyPzM: str | list[str] = "PXPYPZM",
+    suffix: str = "",
+) -> Callable:
+    suffix_PxPyPzM_list = _resolve_suffix_PxPyPzM(suffix_PxPyPzM)
+    names = [f"{prefix}{suffix_PxPyPzM_list[k]}{suffix}" for k in range(4)]
+
+    def pe(columns: Mapping):
+        import numpy as np
+
+        result = np.hypot(
+            _get_column(columns, names[0]), _get_column(columns, names[1])
+        )
+        np.hypot(result, _get_column(columns, names[2]), out=result)
+        if mass_hypothesis is not None:
+            mass = _get_column_or_value(columns, mass_hypothesis)
+        else:
+            mass = _get_column(columns, names[3])
+        np.hypot(result, mass, out=result)
+        return result
+
+    return pe
+
+
+def get_p_function(
+    prefix: str, *, suffix_PxPyPz: str | list[str] = "PXPYPZ", suffix: str = ""
+) -> Callable:
+    suffix_PxPyPz_list = _resolve_suffix_PxPyPz(suffix_PxPyPz)
+    names = [f"{prefix}{suffix_PxPyPz_list[k]}{suffix}" for k in range(3)]
+
+    def p(columns: Mapping):
+        import numpy as np
+
+        result = np.hypot(
+            _get_column(columns, names[0]), _get_column(columns, names[1])
+        )
+        np.hypot(result, _get_column(columns, names[2]), out=result)
+        return result
+
+    return p
+
+
+def get_clone_rejection_function(
+    prefixes: list[str], threshold: float | str
+) -> Callable:
+
+    def clone_rejection(columns: Mapping):
+        import numpy as np
+
+        # each column is converted only once, and each momentum magnitude is
+        # computed only once from the converted components
+        momenta = [
+            [
+                _get_column(columns, f"{prefix}{component}")
+                for component in ["_PX", "_PY", "_PZ"]
+            ]
+            for prefix in prefixes
+        ]
+        p = []
+        for px, py, pz in momenta:
+            magnitude = np.hypot(px, py)
+            np.hypot(magnitude, pz, out=magnitude)
+            p.append(magnitude)
+        cut = _get_column_or_value(columns, threshold)
+
+        result = np.ones(len(p[0]) if len(p) > 0 else 0, dtype=bool)
+        angle = np.empty(len(result))
+        component = np.empty(len(result))
+        passed = np.empty(len(result), dtype=bool)
+        for i in range(len(prefixes)):
+            for j in range(i + 1, len(prefixes)):
+                np.multiply(momenta[i][0], momenta[j][0], out=angle)
+                for k in [1, 2]:
+                    np.multiply(momenta[i][k], momenta[j][k], out=component)
+                    np.add(angle, component, out=angle)
+                np.divide(angle, p[i], out=angle)
+                np.divide(angle, p[j], out=angle)
+                with np.errstate(invalid="ignore"):
+                    np.arccos(angle, out=angle)
+                # the angle is non-negative, and NaN fails the cut as in ROOT
+                np.greater(angle, cut, out=passed)
+                np.logical_and(result, passed, out=result)
+        return result
+
+    return clone_rejection
+
+
+class ExpressionGraph:
+    """
+    Builds the quantities of the get_*_expression builders as a graph of named
+    intermediates, so that shared subterms (e.g. the momentum of a track used in
+    several pairs) are computed only once per event.
+
+    The definitions are kept in dependency order and can be booked as RDataFrame
+    Defines (define_on) or turned into chained RooFormulaVars (build_roofit).
+    """
+
+    def __init__(self, *, name_prefix: str = "expr_"):
+        self.name_prefix = name_prefix
+        self._definitions: dict[str, str] = {}
+        # the expressions as given, since aliases are stored as the name they alias
+        self._expressions: dict[str, str] = {}
+        self._names: dict[str, str] = {}
+
+    def define(self, name: str, expression: str) -> str:
+        if self._expressions.get(name) == expression:
+            return name
+        if name in self._expressions:
+            raise ValueError(
+                f"{name} is already defined as {self._expressions[name]}, "
+                f"cannot redefine it as {expression}"
+            )
+        self._expressions[name] = expression
+        # identical expressions are computed only once, a new name just aliases it
+        expression = self._names.get(expression, expression)
+        self._definitions[name] = expression
+        self._names.setdefault(expression, name)
+        return name
+
+    def get_definitions(self) -> list[tuple[str, str]]:
+        return list(self._definitions.items())
+
+    def add_p(
+        self,
+        prefix: str,
+        *,
+        suffix_PxPyPz: str | list[str] = "PXPYPZ",
+        suffix: str = "",
+        name: str | None = None,
+    ) -> str:
+        if name is None:
+            tag = _get_convention_tag(suffix_PxPyPz, "PXPYPZ")
+            name = f"{self.name_prefix}{prefix}_P{tag}{suffix}"
+        return self.define(
+            name,
+            get_p_expression(prefix, suffix_PxPyPz=suffix_PxPyPz, suffix=suffix),
+        )
+
+    def add_pe(
+        self,
+        prefix: str,
+        *,
+        mass_hypothesis: float | str | None = None,
+        suffix_PxPyPzM: str | list[str] = "PXPYPZM",
+        suffix: str = "",
+        name: str | None = None,
+    ) -> str:
+        if name is None:
+            tag = _get_convention_tag(suffix_PxPyPzM, "PXPYPZM")
+            name = f"{self.name_prefix}{prefix}_PE{tag}{suffix}"
+            if mass_hypothesis is not None:
+                name += "_" + "".join(
+                    char if char.isalnum() else "_" for char in str(mass_hypothesis)
+                )
+        return self.define(
+            name,
+            get_pe_expression(
+                prefix,
+                mass_hypothesis=mass_hypothesis,
+                suffix_PxPyPzM=suffix_PxPyPzM,
+                suffix=suffix,
+            ),
+        )
+
+    def add_invariant_mass(
+        self,
+        prefix: list[str],
+        *,
+        suffix_PxPyPzE: str | list[str] = "PXPYPZPE",
+        suffix: str = "",
+        squared: bool = False,
+        name: str | None = None,
+    ) -> str:
+        tag = _get_convention_tag(suffix_PxPyPzE, "PXPYPZPE")
+        suffix_PxPyPzE = _resolve_suffix_PxPyPzE(suffix_PxPyPzE)
+        combination = "_".join(prefix)
+
+        sums = []
+        for component in suffix_PxPyPzE:
+            terms = [pre + component + suffix for pre in prefix]
+            if len(terms) == 1:
+                sums.append(terms[0])
+            else:
+                sums.append(
+                    self.define(
+                        f"{self.name_prefix}{combination}{component}{suffix}_sum",
+                        " + ".join(terms),
+                    )
+                )
+        sum_of_PX, sum_of_PY, sum_of_PZ, sum_of_E = sums
+
+        mass_squared_name = f"{self.name_prefix}{combination}_M2{tag}{suffix}"
+        if squared and name is not None:
+            mass_squared_name = name
+        mass_squared = self.define(
+            mass_squared_name,
+            f"{sum_of_E} * {sum_of_E} - {sum_of_PX} * {sum_of_PX} - {sum_of_PY} * {sum_of_PY} - {sum_of_PZ} * {sum_of_PZ}",
+        )
+        if squared:
+            return mass_squared
+        return self.define(
+            (
+                name
+                if name is not None
+                else f"{self.name_prefix}{combination}_M{tag}{suffix}"
+            ),
+            f"sqrt({mass_squared})",
+        )
+
+    def add_clone_rejection(
+        self, prefixes: list[str], threshold: float | str, *, name: str | None = None
+    ) -> str:
+        momenta = [self.add_p(prefix) for prefix in prefixes]
+        expressions = []
+        for i in range(len(prefixes)):
+            for j in range(i + 1, len(prefixes)):
+                angle = f"acos(({prefixes[i]}_PX * {prefixes[j]}_PX + {prefixes[i]}_PY * {prefixes[j]}_PY + {prefixes[i]}_PZ * {prefixes[j]}_PZ) / {momenta[i]} / {momenta[j]})"
+                expressions.append(f"(abs({angle}) > {threshold})")
+        return self.define(
+            (
+                name
+                if name is not None
+                else f"{self.name_prefix}{'_'.join(prefixes)}_clone_rejection"
+            ),
+            " && ".join(expressions),
+        )
+
+    def define_on(self, rdf):
+        # returns the RDataFrame node with all definitions booked (lazily)
+        existing_columns = set(str(column) for column in rdf.GetColumnNames())
+        for name, expression in self._definitions.items():
+            if name not in existing_columns:
+                rdf = rdf.Define(name, expression)
+        return rdf
+
+    def build_roofit(self, variables) -> dict:
+        # variables: the RooAbsReals of the input columns, matched by name
+        import re
+
+        import ROOT
+
+        available = {variable.GetName(): variable for variable in variables}
+        formula_vars = {}
+        for name, expression in self._definitions.items():
+            dependencies = ROOT.RooArgList()
+            for identifier in dict.fromkeys(re.findall(r"[A-Za-z_]\w*", expression)):
+                if identifier in available:
+                    dependencies.add(available[identifier])
+            formula_var = ROOT.RooFormulaVar(name, name, expression, dependencies)
+            available[name] = formula_var
+            formula_vars[name] = formula_var
+        return formula_vars
+
+
+_KINEMATICS_CPP = """
+#ifndef DATA_ANALYSIS_HELPER_KINEMATICS
+#define DATA_ANALYSIS_HELPER_KINEMATICS
+#include <cmath>
+#include <cstddef>
+
+namespace data_analysis_helper {
+
+inline double p(double px, double py, double pz)
+{
+    return std::sqrt(px * px + py * py + pz * pz);
+}
+
+inline double pe(double px, double py, double pz, double m)
+{
+    return std::sqrt(px * px + py * py + pz * pz + m * m);
+}
+
+// components: (px, py, pz, e) of each particle
+template <typename... Ts>
+inline double invariant_mass_squared(Ts... components)
+{
+    const double c[] = {static_cast<double>(components)...};
+    double px = 0, py = 0, pz = 0, e = 0;
+    for (std::size_t i = 0; i + 3 < sizeof...(Ts); i += 4) {
+        px += c[i];
+        py += c[i + 1];
+        pz += c[i + 2];
+        e += c[i + 3];
+    }
+    return e * e - px * px - py * py - pz * pz;
+}
+
+template <typename... Ts>
+inline double invariant_mass(Ts... components)
+{
+    return std::sqrt(invariant_mass_squared(components...));
+}
+
+// components: (px, py, pz) of each track
+template <typename... Ts>
+inline bool clone_rejection(double threshold, Ts... components)
+{
+    constexpr std::size_t n = sizeof...(Ts) / 3;
+    const double c[] = {static_cast<double>(components)...};
+    double momenta[n > 0 ? n : 1];
+    for (std::size_t i = 0; i < n; ++i) {
+        momenta[i] = p(c[3 * i], c[3 * i + 1], c[3 * i + 2]);
+    }
+    for (std::size_t i = 0; i < n; ++i) {
+        for (std::size_t j = i + 1; j < n; ++j) {
+            const double dot = c[3 * i] * c[3 * j] + c[3 * i + 1] * c[3 * j + 1] + c[3 * i + 2] * c[3 * j + 2];
+            if (!(std::abs(std::acos(dot / momenta[i] / momenta[j])) > threshold)) {
+                return false;
+            }
+        }
+    }
+    return true;
+}
+
+} // namespace data_analysis_helper
+#endif
+"""
+
+
+def _declare_kinematics_functions() -> None:
+    import ROOT
+
+    # the include guard makes repeated declarations harmless
+    ROOT.gInterpreter.Declare(_KINEMATICS_CPP)
+
+
+def book_kinematics(
+    rdf,
+    prefixes: list[str],
+    *,
+    p: bool = True,
+    mass_hypotheses: Mapping[str, float | str] | None = None,
+    invariant_masses: int | list[list[str]] | None = None,
+    clone_rejection: float | str | None = None,
+    suffix_PxPyPzE: str | list[str] = "PXPYPZPE",
+    suffix: str = "",
+    name_prefix: str = "expr_",
+):
+    """
+    Lazily book kinematic quantities of the particles in prefixes on an RDataFrame.
+
+    mass_hypotheses maps a prefix to the mass (number or column name) used to
+    recompute its energy, which is then also used in the invariant masses.
+    invariant_masses is either the number of particles to combine (2 for all pairs,
+    3 for all triplets) or a list of explicit combinations. The quantities are
+    computed by C++ functions declared once, and nothing is evaluated until the first
+    action runs; enable ROOT.EnableImplicitMT() to run the event loop multithreaded.
+
+    Returns the new RDataFrame node and a dict of quantity -> column name, where the
+    quantities are ("p", prefix), ("pe", prefix, mass_hypothesis),
+    ("m", tuple(combination)) and "clone_rejection". Column names of a non-default
+    suffix_PxPyPzE carry a tag (e.g. expr_pi1_pi2_M_TRUEP), so that the reco and the
+    true quantities can be booked on the same node.
+    """
+    from itertools import combinations
+
+    _declare_kinematics_functions()
+    tag = _get_convention_tag(suffix_PxPyPzE, "PXPYPZPE")
+    suffix_PxPyPzE = _resolve_suffix_PxPyPzE(suffix_PxPyPzE)
+    if mass_hypotheses is None:
+        mass_hypotheses = {}
+
+    columns = {}
+
+    def define(quantity, name: str, expression: str) -> None:
+        nonlocal rdf
+        rdf = rdf.Define(name, expression)
+        columns[quantity] = name
+
+    components = {
+        prefix: [f"{prefix}{component}{suffix}" for component in suffix_PxPyPzE]
+        for prefix in prefixes
+    }
+
+    if p:
+        for prefix in prefixes:
+            define(
+                ("p", prefix),
+                f"{name_prefix}{prefix}_P{tag}{suffix}",
+                f"data_analysis_helper::p({', '.join(components[prefix][:3])})",
+            )
+
+    for prefix, mass_hypothesis in mass_hypotheses.items():
+        mass_tag = "".join(
+            char if char.isalnum() else "_" for char in str(mass_hypothesis)
+        )
+        name = f"{name_prefix}{prefix}_PE{tag}{suffix}_{mass_tag}"
+        define(
+            ("pe", prefix, mass_hypothesis),
+            name,
+            f"data_analysis_helper::pe({', '.join(components[prefix][:3])}, {mass_hypothesis})",
+        )
+        components[prefix] = components[prefix][:3] + [name]
+
+    if invariant_masses is not None:
+        if isinstance(invariant_masses, int):
+            invariant_masses = [
+                list(combination)
+                for combination in combinations(prefixes, invariant_masses)
+            ]
+        for combination in invariant_masses:
+            arguments = ", ".join(
+                column for prefix in combination for column in components[prefix]
+            )
+            define(
+                ("m", tuple(combination)),
+                f"{name_prefix}{'_'.join(combination)}_M{tag}{suffix}",
+                f"data_analysis_helper::invariant_mass({arguments})",
+            )
+
+    if clone_rejection is not None:
+        arguments = ", ".join(
+            column for prefix in prefixes for column in components[prefix][:3]
+        )
+        define(
+            "clone_rejection",
+            f"{name_prefix}{'_'.join(prefixes)}_clone_rejection{tag}{suffix}",
+            f"data_analysis_helper::clone_rejection({clone_rejection}, {arguments})",
+        )
+
+    return rdf, columns
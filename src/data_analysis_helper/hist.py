@@ -0,0 +1,297 @@
+# SPDX-FileCopyrightText: 2024-present Anfeng Li <anfeng.li@cern.ch>
+#
+# SPDX-License-Identifier: MIT
+
+import builtins
+
+
+def histogram(x, bins, *, range=None, weights=None, chunk_size: int = 2**20):
+    """
+    Accumulate sum(w) and sum(w^2) per bin in a single pass.
+
+    x can be an array (including np.memmap), which is processed in chunks of
+    chunk_size, or an iterator over chunks (e.g. from uproot.iterate), where each
+    chunk is either an array of values or a (values, weights) tuple. Iterators are
+    consumed only once, so they need fixed bin edges: either explicit edges or an
+    integer number of bins together with range. String binning rules (e.g. "auto")
+    are only supported for arrays.
+
+    Returns (sumw, sumw2, bin_edges), with the same binning convention as
+    np.histogram.
+    """
+    import numpy as np
+
+    is_stream = _is_stream(x)
+    if is_stream and weights is not None:
+        raise ValueError(
+            "weights cannot be given separately for an iterator of chunks, "
+            "yield (values, weights) tuples instead"
+        )
+
+    if np.ndim(bins) == 1:
+        bin_edges = np.asarray(bins, dtype=np.float64)
+    elif isinstance(bins, str):
+        # binning rules such as "auto" depend on the data
+        if is_stream:
+            raise ValueError(
+                f"bins={bins!r} needs the whole data and cannot be used for an "
+                "iterator of chunks"
+            )
+        bin_edges = np.histogram_bin_edges(x, bins, range=range, weights=weights)
+    elif range is not None:
+        bin_edges = np.histogram_bin_edges([], bins, range=range)
+    elif is_stream:
+        raise ValueError(
+            "range is required for an iterator of chunks unless bin edges are given"
+        )
+    else:
+        bin_edges = np.histogram_bin_edges(x, bins)
+
+    nbins = len(bin_edges) - 1
+    sumw = np.zeros(nbins)
+    sumw2 = np.zeros(nbins)
+    # equal-width bins are located arithmetically instead of by binary search
+    uniform = bool(np.isfinite(bin_edges).all()) and np.array_equal(
+        bin_edges, np.linspace(bin_edges[0], bin_edges[-1], nbins + 1)
+    )
+    for x_chunk, weights_chunk in _iter_chunks(x, weights, chunk_size, is_stream):
+        _fill(sumw, sumw2, bin_edges, x_chunk, weights_chunk, uniform)
+    return sumw, sumw2, bin_edges
+
+
+def _is_stream(x) -> bool:
+    # arrays (and array-likes such as pandas Series) are data, other iterables
+    # are chunks, unless they are sequences of numbers
+    import numpy as np
+
+    if hasattr(x, "__array__"):
+        return False
+    if not hasattr(x, "__len__"):
+        return True
+    return len(x) > 0 and (isinstance(x[0], tuple) or np.ndim(x[0]) > 0)
+
+
+def _iter_chunks(x, weights, chunk_size, is_stream):
+    if not is_stream:
+        for start in builtins.range(0, len(x), chunk_size):
+            yield (
+                x[start : start + chunk_size],
+                None if weights is None else weights[start : start + chunk_size],
+            )
+    else:
+        for chunk in x:
+            if isinstance(chunk, tuple):
+                yield chunk
+            else:
+                yield chunk, None
+
+
+def _fill(sumw, sumw2, bin_edges, x, weights, uniform):
+    import numpy as np
+
+    x = np.asarray(x)
+    nbins = len(bin_edges) - 1
+    first = bin_edges[0]
+    last = bin_edges[-1]
+    in_range = (x >= first) & (x <= last)
+    x = x[in_range]
+    if uniform:
+        # as np.histogram: compute the index arithmetically, then correct it for
+        # rounding against the actual edges
+        indices = ((x - first) * (nbins / (last - first))).astype(np.intp)
+        indices[indices == nbins] -= 1
+        indices[x < bin_edges[indices]] -= 1
+        indices[(x >= bin_edges[indices + 1]) & (indices != nbins - 1)] += 1
+    else:
+        indices = np.searchsorted(bin_edges, x, side="right") - 1
+        # the last bin includes its right edge, as in np.histogram
+        indices[x == last] = nbins - 1
+    if weights is None:
+        counts = np.bincount(indices, minlength=nbins)
+        sumw += counts
+        sumw2 += counts
+    else:
+        weights = np.asarray(weights, dtype=np.float64)[in_range]
+        sumw += np.bincount(indices, weights=weights, minlength=nbins)
+        sumw2 += np.bincount(indices, weights=weights * weights, minlength=nbins)
+
+
+class HistogramCache:
+    """
+    LRU cache of histogram results, for repeatedly plotting the same data.
+
+    Entries are keyed on a cheap fingerprint of the data and weights (dtype, shape and
+    a fixed sample of the raw buffer) together with the binning, so computing a key
+    does not read the whole array. Modifying an array in place may therefore go
+    unnoticed; call clear() after doing so, which also deletes the results stored in
+    directory. Iterators of chunks are never cached.
+
+    The memory tier keeps at most max_bytes of results. If directory is given, results
+    are also stored there and reused across cache instances and sessions. Since the
+    data may be regenerated between sessions, results on disk are stored with a
+    checksum of the full data and weights, which is verified before they are reused.
+    """
+
+    def __init__(self, *, max_bytes: int = 2**28, directory=None):
+        from collections import OrderedDict
+
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        if directory is not None:
+            import os
+
+            os.makedirs(directory, exist_ok=True)
+
+    def histogram(self, x, bins, *, range=None, weights=None, chunk_size: int = 2**20):
+        import numpy as np
+
+        if _is_stream(x):
+            return histogram(
+                x, bins, range=range, weights=weights, chunk_size=chunk_size
+            )
+
+        x = np.asarray(x)
+        if weights is not None:
+            weights = np.asarray(weights)
+        key = _get_histogram_key(x, bins, range, weights)
+
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return tuple(array.copy() for array in self._entries[key])
+
+        checksum = None
+        if self.directory is not None:
+            checksum = _get_checksum(x, weights)
+        result = self._load(key, checksum)
+        if result is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            result = histogram(
+                x, bins, range=range, weights=weights, chunk_size=chunk_size
+            )
+            self._save(key, result, checksum)
+        self._insert(key, result)
+        return tuple(array.copy() for array in result)
+
+    def clear(self, *, disk: bool = True) -> None:
+        # clears the memory tier, and the entries in directory unless disk is False
+        self._entries.clear()
+        self._nbytes = 0
+        if disk and self.directory is not None:
+            import glob
+            import os
+
+            for path in glob.glob(
+                os.path.join(glob.escape(os.fspath(self.directory)), "*.npz")
+            ):
+                os.remove(path)
+
+    def _insert(self, key, result) -> None:
+        nbytes = sum(array.nbytes for array in result)
+        if nbytes > self.max_bytes:
+            return
+        self._entries[key] = result
+        self._nbytes += nbytes
+        while self._nbytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._nbytes -= sum(array.nbytes for array in evicted)
+
+    def _get_path(self, key):
+        import os
+
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def _load(self, key, checksum):
+        import os
+
+        import numpy as np
+
+        if self.directory is None or not os.path.exists(self._get_path(key)):
+            return None
+        with np.load(self._get_path(key)) as file:
+            # the key only samples the data, a different checksum is a stale entry
+            if "checksum" not in file or str(file["checksum"]) != checksum:
+                return None
+            return file["sumw"], file["sumw2"], file["bin_edges"]
+
+    def _save(self, key, result, checksum) -> None:
+        import os
+
+        import numpy as np
+
+        if self.directory is None:
+            return
+        sumw, sumw2, bin_edges = result
+        # write to a temporary file first so that readers never see partial files
+        temporary_path = self._get_path(key) + f".{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as file:
+            np.savez(
+                file,
+                sumw=sumw,
+                sumw2=sumw2,
+                bin_edges=bin_edges,
+                checksum=np.array(checksum),
+            )
+        os.replace(temporary_path, self._get_path(key))
+
+
+default_cache = HistogramCache()
+
+
+def _get_histogram_key(x, bins, range, weights) -> str:
+    import hashlib
+
+    import numpy as np
+
+    hasher = hashlib.blake2b(digest_size=20)
+    _update_fingerprint(hasher, x)
+    if weights is None:
+        hasher.update(b"no weights")
+    else:
+        _update_fingerprint(hasher, weights)
+    if np.ndim(bins) == 1:
+        hasher.update(np.ascontiguousarray(bins, dtype=np.float64).tobytes())
+    else:
+        hasher.update(repr(bins).encode())
+    hasher.update(repr(None if range is None else tuple(map(float, range))).encode())
+    return hasher.hexdigest()
+
+
+def _get_checksum(x, weights) -> str:
+    # of the whole buffers, unlike the key
+    import hashlib
+
+    import numpy as np
+
+    hasher = hashlib.blake2b(digest_size=20)
+    for array in [x] if weights is None else [x, weights]:
+        hasher.update(f"{array.dtype.str} {array.shape}".encode())
+        hasher.update(memoryview(np.ascontiguousarray(array)).cast("B"))
+    return hasher.hexdigest()
+
+
+def _update_fingerprint(hasher, array, *, n_samples: int = 64, block_size: int = 4096):
+    import numpy as np
+
+    hasher.update(f"{array.dtype.str} {array.shape}".encode())
+    if array.size == 0:
+        return
+    if array.flags.c_contiguous:
+        # evenly spaced blocks of the raw buffer, including the first and last block
+        buffer = array.reshape(-1).view(np.uint8)
+        if len(buffer) <= n_samples * block_size:
+            hasher.update(buffer.tobytes())
+        else:
+            starts = np.linspace(0, len(buffer) - block_size, n_samples).astype(np.intp)
+            for start in starts:
+                hasher.update(buffer[start : start + block_size].tobytes())
+    else:
+        n_elements = n_samples * block_size // array.itemsize
+        indices = np.unique(np.linspace(0, array.size - 1, n_elements).astype(np.intp))
+        hasher.update(np.ascontiguousarray(array.flat[indices]).tobytes())
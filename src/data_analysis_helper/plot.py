@@ -13,18 +13,28 @@ def histplot(
     ax=None,
     weights=None,
     histtype="errorbar",
+    cache=None,
     **kwargs,
 ):
     import matplotlib.pyplot as plt
     import mplhep
-    import numpy as np
+
+    from . import hist as hist_module
 
     if ax is None:
         fig, ax = plt.subplots()
-    if weights is None:
-        weights = np.ones(len(x))
-    hist, bin_edges = np.histogram(x, bins, range=range, weights=weights)
-    hist_sq, _ = np.histogram(x, bin_edges, range=range, weights=weights**2)
+    # x can also be an iterator over (x, weights) chunks, see hist.histogram
+    # cache: True for hist.default_cache, or a hist.HistogramCache
+    if cache is True:
+        cache = hist_module.default_cache
+    if cache:
+        hist, hist_sq, bin_edges = cache.histogram(
+            x, bins, range=range, weights=weights
+        )
+    else:
+        hist, hist_sq, bin_edges = hist_module.histogram(
+            x, bins, range=range, weights=weights
+        )
     mplhep.histplot(
         hist, bins=bin_edges, w2=hist_sq, histtype=histtype, ax=ax, **kwargs
     )
@@ -2,6 +2,8 @@
 #
 # SPDX-License-Identifier: MIT
 
+import sys
+import time
 from collections.abc import Callable, Iterable
 from typing import Literal
 
@@ -10,6 +12,90 @@ import ROOT
 from . import print_func
 
 
+class StoppingPolicy:
+    """
+    Criteria for stopping RepeatedFit.do_repeated_fit before all fits are run. Each
+    criterion is disabled when None; the fits stop as soon as any enabled one is met.
+
+    reproduce: the best NLL is reproduced (within nll_tolerance) by this many fits
+    max_wall_time: seconds since the start of do_repeated_fit
+    max_cpu_time: summed CPU seconds of the fits, including the parallel workers
+    unseen_probability: the Good-Turing estimate of the probability that another fit
+        finds a minimum not seen yet, i.e. the fraction of fits whose minimum was found
+        only once, drops below this value
+
+    Only fits with a status in allowed_statuses are considered for reproduce and
+    unseen_probability, and minima closer than nll_tolerance count as the same.
+    The NLL criteria are not checked before min_fits such fits are done.
+    """
+
+    def __init__(
+        self,
+        *,
+        reproduce: int | None = None,
+        nll_tolerance: float = 1e-3,
+        max_wall_time: float | None = None,
+        max_cpu_time: float | None = None,
+        unseen_probability: float | None = None,
+        allowed_statuses: list[int] | Literal["all"] = [0],
+        min_fits: int = 2,
+    ):
+        self.reproduce = reproduce
+        self.nll_tolerance = nll_tolerance
+        self.max_wall_time = max_wall_time
+        self.max_cpu_time = max_cpu_time
+        self.unseen_probability = unseen_probability
+        self.allowed_statuses = allowed_statuses
+        self.min_fits = min_fits
+        self.start()
+
+    def start(self) -> None:
+        self._start_time = time.perf_counter()
+        self.cpu_time = 0.0
+
+    def add_cpu_time(self, cpu_time: float) -> None:
+        self.cpu_time += cpu_time
+
+    def check(self, results) -> str | None:
+        # results: the results table of RepeatedFit. Returns the reason to stop.
+        import numpy as np
+
+        if (
+            self.max_wall_time is not None
+            and time.perf_counter() - self._start_time >= self.max_wall_time
+        ):
+            return f"wall time budget of {self.max_wall_time} s used up"
+        if self.max_cpu_time is not None and self.cpu_time >= self.max_cpu_time:
+            return f"CPU time budget of {self.max_cpu_time} s used up"
+        if self.reproduce is None and self.unseen_probability is None:
+            return None
+
+        mask = results["index"] >= 0
+        if self.allowed_statuses != "all":
+            mask &= np.isin(results["status"], self.allowed_statuses)
+        nlls = np.sort(results["min_nll"][mask])
+        if len(nlls) < max(self.min_fits, 1):
+            return None
+
+        if self.reproduce is not None:
+            count = np.count_nonzero(nlls <= nlls[0] + self.nll_tolerance)
+            if count >= self.reproduce:
+                return f"best NLL reproduced by {count} fits"
+        if self.unseen_probability is not None:
+            # group the sorted NLLs into minima separated by more than the tolerance
+            group_starts = np.flatnonzero(
+                np.diff(nlls, prepend=-np.inf) > self.nll_tolerance
+            )
+            group_sizes = np.diff(np.append(group_starts, len(nlls)))
+            probability = np.count_nonzero(group_sizes == 1) / len(nlls)
+            if probability < self.unseen_probability:
+                return (
+                    f"estimated probability of an unseen minimum {probability:.3g} "
+                    f"below {self.unseen_probability}"
+                )
+        return None
+
+
 class RepeatedFit:
     def __init__(
         self,
@@ -22,200 +108,1399 @@ class RepeatedFit:
         allow_fixed_params: bool = False,
         random_seed: int | None = None,
         print_func: Callable = print_func,
+        start_points: Literal[
+            "uniform", "latin-hypercube", "sobol", "halton", "gaussian"
+        ] = "uniform",
     ):
         self.model: ROOT.RooAbsPdf = model
         self.data: ROOT.RooDataSet = data
         self.num_fits: int = num_fits
         self.print_func = print_func
 
+        # resolve the parameters of the model only once, and look them up by name
+        self._parameters: ROOT.RooArgSet = model.getParameters(data)
+        self._parameter_index: dict[str, ROOT.RooAbsArg] = {
+            parameter.GetName(): parameter for parameter in self._parameters
+        }
+
         if parameter_list is None:
             self.parameter_list: list[ROOT.RooAbsArg] = [
                 parameter
-                for parameter in model.getParameters(data)
+                for parameter in self._parameters
                 if (not parameter.isConstant()) or allow_fixed_params
             ]
         else:
             self.parameter_list: list[ROOT.RooAbsArg] = [
                 # match just by name
-                model.getParameters(data).find(parameter)
+                self._parameter_index[
+                    parameter if isinstance(parameter, str) else parameter.GetName()
+                ]
                 for parameter in parameter_list
-                # IMPORTANT: filter fixed parameters, which can be overridden by allow_fixed_params
-                if (not model.getParameters(data).find(parameter).isConstant())
-                or allow_fixed_params
+            ]
+            # IMPORTANT: filter fixed parameters, which can be overridden by allow_fixed_params
+            self.parameter_list = [
+                parameter
+                for parameter in self.parameter_list
+                if (not parameter.isConstant()) or allow_fixed_params
             ]
 
+        # the ROOT random generator is still seeded for code relying on it
         if random_seed is not None:
             ROOT.RooRandom.randomGenerator().SetSeed(random_seed)
         else:
             ROOT.RooRandom.randomGenerator().SetSeed()
 
+        # start points are kept as a (num_fits, num_parameters) matrix
         if parameter_samples is None:
-            self.parameter_samples: ROOT.RooDataSet = ROOT.RooUniform(
-                "uniform", "uniform", self.parameter_list[0]
-            ).generate(self.parameter_list[0], num_fits)
-            for parameter in self.parameter_list[1:]:
-                self.parameter_samples.merge(
-                    ROOT.RooUniform("uniform", "uniform", parameter).generate(
-                        parameter, num_fits
-                    )
+            import numpy as np
+
+            self.start_point_names: list[str] = [
+                parameter.GetName() for parameter in self.parameter_list
+            ]
+            self.start_points = _generate_start_points(
+                self.parameter_list,
+                num_fits,
+                strategy=start_points,
+                rng=np.random.default_rng(random_seed),
+            )
+            self._parameter_samples = None
+        else:
+            import numpy as np
+
+            self.start_point_names: list[str] = [
+                variable.GetName() for variable in parameter_samples.get()
+            ]
+            # only the first num_fits samples are used
+            columns = parameter_samples.to_numpy()
+            self.start_points = np.stack(
+                [columns[name][:num_fits] for name in self.start_point_names], axis=1
+            ).astype(np.float64)
+            self._parameter_samples = parameter_samples
+
+    @property
+    def parameter_samples(self) -> ROOT.RooDataSet:
+        # the start points as a RooDataSet, only built when requested
+        if self._parameter_samples is None:
+            self._parameter_samples = ROOT.RooDataSet.from_numpy(
+                {
+                    name: self.start_points[:, i]
+                    for i, name in enumerate(self.start_point_names)
+                },
+                self.parameter_list,
+                name="parameter_samples",
+            )
+        return self._parameter_samples
+
+    def do_repeated_fit(
+        self,
+        use_initial_values=True,
+        *,
+        n_workers: int | None = None,
+        checkpoint: str | None = None,
+        checkpoint_covariance: bool = False,
+        keep_fitresults: int | None = None,
+        keep_statuses: list[int] | Literal["all"] = [0],
+        stopping: StoppingPolicy | None = None,
+        reuse_nll: bool = False,
+        before_fit: Callable | None = None,
+        after_fit: Callable | None = None,
+        **fit_options,
+    ) -> None:
+        # checkpoint: directory where each finished fit is appended. If it already
+        # contains fits of an interrupted run, their start points are reused and only
+        # the remaining fits are run. See load_fit_checkpoint for reading it.
+        # keep_fitresults: keep the full RooFitResult only for this number of best
+        # fits (status in keep_statuses first, then lowest NLL), the others are None
+        # in fitresults. keep_statuses should match the allowed_statuses later passed
+        # to get_best_result, which raises if the best such fit was not retained.
+        # The summary of every fit is always kept in the results table. A checkpoint
+        # also stores the RooFitResults of the retained fits only, so on resuming
+        # fits not retained in the interrupted run have no RooFitResult.
+        # stopping: stop before all num_fits fits are run, see StoppingPolicy. The
+        # reason is recorded in stop_reason; fits not run have index -1 in results.
+        # reuse_nll: build the NLL only once (once per worker in parallel mode)
+        # instead of calling fitTo for every fit, with the same fit results as
+        # fitTo. Only the fit options which can be split into
+        # createNLL and RooMinimizer settings are supported, e.g. EvalBackend="cpu"
+        # for the vectorized CPU evaluation backend.
+        # before_fit(index, start_values) and after_fit(index, fitresult, metrics)
+        # are called in this process around every fit, where start_values is None
+        # for the initial values and metrics is the row of the performance table (see
+        # get_performance_summary). In parallel mode the fits run in the workers, so
+        # before_fit cannot be called before them and is not supported, while
+        # after_fit is called as the results arrive.
+        # In parallel mode every fit starts from the model state at call time, with
+        # only the sampled parameters overridden, and the begin/end markers are
+        # printed as the results arrive. In serial mode the parameters which are not
+        # sampled, and the errors (step sizes) of all parameters, carry over from the
+        # previous fit, so the two modes agree on the minima but not exactly on the
+        # fit results.
+        import numpy as np
+
+        # use original initial values when index == 0 and use_initial_values
+        use_initial = np.zeros(self.num_fits, dtype=bool)
+        use_initial[:1] = use_initial_values
+        self._run_fits(
+            self.data,
+            self.start_point_names,
+            self.start_points,
+            use_initial,
+            n_workers=n_workers,
+            checkpoint=checkpoint,
+            checkpoint_covariance=checkpoint_covariance,
+            keep_fitresults=keep_fitresults,
+            keep_statuses=keep_statuses,
+            stopping=stopping,
+            reuse_nll=reuse_nll,
+            before_fit=before_fit,
+            after_fit=after_fit,
+            fit_options=fit_options,
+        )
+
+    def _run_fits(
+        self,
+        data: ROOT.RooAbsData,
+        start_point_names: list[str],
+        start_points,
+        use_initial,
+        *,
+        n_workers: int | None,
+        checkpoint: str | None,
+        checkpoint_covariance: bool,
+        keep_fitresults: int | None,
+        keep_statuses: list[int] | Literal["all"],
+        stopping: StoppingPolicy | None,
+        reuse_nll: bool,
+        fit_options: dict,
+        before_fit: Callable | None = None,
+        after_fit: Callable | None = None,
+    ) -> None:
+        # fits data from every row of start_points, and fills fitresults and results
+        import numpy as np
+
+        if before_fit is not None and n_workers is not None and n_workers > 1:
+            raise ValueError("before_fit is not supported with n_workers > 1")
+
+        num_fits = len(start_points)
+        fit_options = dict(fit_options, Save=True)
+        self.fitresults: list[ROOT.RooFitResult | None] = [None] * num_fits
+        self.result_parameter_names: list[str] = [
+            parameter.GetName()
+            for parameter in self._parameters
+            if not parameter.isConstant()
+        ]
+        self.results = _get_empty_results(num_fits, len(self.result_parameter_names))
+        self.performance = _get_empty_performance(num_fits)
+        self._keep_fitresults = keep_fitresults
+        self._keep_statuses = keep_statuses
+        self._retained_heap: list[tuple] = []
+        self.stop_reason: str | None = None
+        indices = list(range(num_fits))
+        if stopping is not None:
+            stopping.start()
+
+        fit_checkpoint = None
+        if checkpoint is not None:
+            fit_checkpoint = _FitCheckpoint(
+                checkpoint,
+                start_point_names=start_point_names,
+                start_points=start_points,
+                use_initial=use_initial,
+                parameter_names=self.result_parameter_names,
+                covariance=checkpoint_covariance,
+            )
+            start_point_names = fit_checkpoint.start_point_names
+            start_points = fit_checkpoint.start_points
+            use_initial = fit_checkpoint.use_initial
+            # the results table is rebuilt from the records, the RooFitResults are
+            # only stored for the fits retained by keep_fitresults
+            records, fitresults = fit_checkpoint.load()
+            for record in records:
+                self._add_record(record, fitresults.get(int(record["index"])))
+            indices = [index for index in indices if self.results["index"][index] < 0]
+            if len(indices) < num_fits:
+                self.print_func(
+                    f"\nresuming from checkpoint {checkpoint}: "
+                    f"{num_fits - len(indices)} of {num_fits} fits already done\n"
                 )
+
+        if stopping is not None:
+            self.stop_reason = stopping.check(self.results)
+            if self.stop_reason is not None:
+                indices = []
+
+        samples = [
+            None if use_initial[index] else start_points[index]
+            for index in range(num_fits)
+        ]
+        if n_workers is not None and n_workers > 1:
+            results = self._iter_parallel_fits(
+                data,
+                indices,
+                start_point_names,
+                samples,
+                n_workers,
+                fit_options,
+                reuse_nll=reuse_nll,
+                # small chunks, so that few fits are left running after stopping
+                chunksize=1 if stopping is not None else None,
+            )
         else:
-            self.parameter_samples = parameter_samples
+            results = self._iter_serial_fits(
+                data,
+                indices,
+                start_point_names,
+                samples,
+                fit_options,
+                reuse_nll=reuse_nll,
+                before_fit=before_fit,
+            )
+        for index, fitresult, metrics in results:
+            self._add_result(index, fitresult)
+            if fit_checkpoint is not None:
+                fit_checkpoint.append(
+                    index,
+                    fitresult,
+                    save_fitresult=self.fitresults[index] is not None,
+                )
+            self._add_performance(index, fitresult, metrics)
+            if after_fit is not None:
+                after_fit(index, fitresult, metrics)
+            if stopping is not None:
+                stopping.add_cpu_time(metrics["cpu_time"])
+                self.stop_reason = stopping.check(self.results)
+                if self.stop_reason is not None:
+                    # cancels the fits not yet started
+                    results.close()
+                    break
+
+        if self.stop_reason is not None:
+            self.print_func(
+                f"\nstopped after {np.count_nonzero(self.results['index'] >= 0)} of "
+                f"{num_fits} fits: {self.stop_reason}\n"
+            )
+
+    def do_staged_fit(
+        self,
+        use_initial_values=True,
+        *,
+        promote: int | float = 0.1,
+        coarse_fraction: float | None = None,
+        coarse_options: dict | None = None,
+        random_seed: int | None = None,
+        n_workers: int | None = None,
+        keep_fitresults: int | None = None,
+        keep_statuses: list[int] | Literal["all"] = [0],
+        reuse_nll: bool = False,
+        **fit_options,
+    ) -> None:
+        # Coarse-to-fine multi-start fit. First all num_fits start points are fitted
+        # cheaply (Strategy=0, no HESSE and MINOS, updated by coarse_options),
+        # optionally on a random fraction coarse_fraction of data. Then only the best
+        # coarse fits (status 0 first, then lowest NLL) are refitted from their
+        # minima with fit_options: promote of them, or this fraction of num_fits if
+        # promote is a float.
+        # The coarse stage is kept in coarse_results, coarse_fitresults and
+        # coarse_performance. Row i of
+        # results and fitresults is the refit of start point promoted_indices[i].
+        import numpy as np
+
+        coarse_data = self.data
+        if coarse_fraction is not None:
+            coarse_data = _get_random_subset(
+                self.data, coarse_fraction, np.random.default_rng(random_seed)
+            )
+        use_initial = np.zeros(self.num_fits, dtype=bool)
+        use_initial[:1] = use_initial_values
+        self.print_func(
+            f"\n********** coarse stage: {self.num_fits} fits on "
+            f"{coarse_data.numEntries()} entries **********\n"
+        )
+        self._run_fits(
+            coarse_data,
+            self.start_point_names,
+            self.start_points,
+            use_initial,
+            n_workers=n_workers,
+            checkpoint=None,
+            checkpoint_covariance=False,
+            keep_fitresults=keep_fitresults,
+            keep_statuses=keep_statuses,
+            stopping=None,
+            reuse_nll=reuse_nll,
+            fit_options={
+                **fit_options,
+                "Strategy": 0,
+                "Hesse": False,
+                "Minos": False,
+                **(coarse_options or {}),
+            },
+        )
+        self.coarse_results = self.results
+        self.coarse_fitresults = self.fitresults
+        self.coarse_performance = self.performance
 
-    def do_repeated_fit(self, use_initial_values=True, **fit_options) -> None:
-        fit_options["Save"] = True
-        self.fitresults: list[ROOT.RooFitResult] = []
-        for index in range(self.num_fits):
+        if isinstance(promote, float):
+            promote = max(1, int(np.ceil(promote * self.num_fits)))
+        order = np.lexsort(
+            (self.coarse_results["min_nll"], self.coarse_results["status"] != 0)
+        )
+        self.promoted_indices = order[:promote]
+        self.print_func(
+            f"\n********** fine stage: refitting coarse fits "
+            f"{self.promoted_indices.tolist()} **********\n"
+        )
+        self._run_fits(
+            self.data,
+            self.result_parameter_names,
+            self.coarse_results["values"][self.promoted_indices],
+            np.zeros(len(self.promoted_indices), dtype=bool),
+            n_workers=n_workers,
+            checkpoint=None,
+            checkpoint_covariance=False,
+            keep_fitresults=keep_fitresults,
+            keep_statuses=keep_statuses,
+            stopping=None,
+            reuse_nll=reuse_nll,
+            fit_options=fit_options,
+        )
+
+    def _add_result(self, index: int, fitresult: ROOT.RooFitResult) -> None:
+        self._add_record(
+            _get_result_record(
+                fitresult, index, self.result_parameter_names, self.results.dtype
+            )[0],
+            fitresult,
+        )
+
+    def _add_record(self, record, fitresult: ROOT.RooFitResult | None) -> None:
+        # record: a row of the results table (or of a checkpoint, whose extra fields
+        # are ignored), fitresult: the full result if available
+        import heapq
+
+        index = int(record["index"])
+        for field in self.results.dtype.names:
+            self.results[field][index] = record[field]
+        self.fitresults[index] = fitresult
+        if self._keep_fitresults is not None:
+            # max-heap on (not allowed, NLL): the root is the worst retained fit
+            status = int(self.results["status"][index])
+            allowed = self._keep_statuses == "all" or status in self._keep_statuses
+            min_nll = float(self.results["min_nll"][index])
+            heapq.heappush(self._retained_heap, (-(not allowed), -min_nll, index))
+            if len(self._retained_heap) > self._keep_fitresults:
+                _, _, worst = heapq.heappop(self._retained_heap)
+                self.fitresults[worst] = None
+
+    def _add_performance(
+        self, index: int, fitresult: ROOT.RooFitResult, metrics: dict
+    ) -> None:
+        metrics["index"] = index
+        metrics["status_history"] = " ".join(
+            f"{fitresult.statusLabelHistory(i)}={fitresult.statusCodeHistory(i)}"
+            for i in range(fitresult.numStatusHistory())
+        )
+        for key, value in metrics.items():
+            self.performance[key][index] = value
+
+    def get_performance_summary(self) -> dict:
+        # Aggregates of the performance table, which has one row per fit with
+        # index (-1 for fits not run), wall_time and cpu_time (s) of the fit,
+        # setup_time (creating the NLL and the minimizer) and minimization_time
+        # (MIGRAD, HESSE and MINOS) in s, rss_delta (increase of the peak RSS in
+        # bytes), n_calls (NLL evaluations) and status_history (status per stage).
+        # setup_time, minimization_time and n_calls are only measured with reuse_nll.
+        import numpy as np
+
+        performance = self.performance[self.performance["index"] >= 0]
+        summary = {"num_fits": len(performance)}
+        for field in ["wall_time", "cpu_time", "setup_time", "minimization_time"]:
+            summary[f"total_{field}"] = float(np.sum(performance[field]))
+            summary[f"mean_{field}"] = (
+                float(np.mean(performance[field])) if len(performance) > 0 else np.nan
+            )
+            summary[f"max_{field}"] = (
+                float(np.max(performance[field])) if len(performance) > 0 else np.nan
+            )
+        summary["max_rss_delta"] = (
+            float(np.max(performance["rss_delta"])) if len(performance) > 0 else np.nan
+        )
+        summary["total_n_calls"] = int(np.sum(performance["n_calls"]))
+        return summary
+
+    def export_performance(self, path: str) -> None:
+        # writes the performance table of the fits run as CSV
+        import csv
+
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(self.performance.dtype.names)
+            for row in self.performance[self.performance["index"] >= 0]:
+                writer.writerow(row.tolist())
+
+    def _iter_serial_fits(
+        self,
+        data: ROOT.RooAbsData,
+        indices: list[int],
+        start_point_names: list[str],
+        samples: list,
+        fit_options: dict,
+        reuse_nll: bool = False,
+        before_fit: Callable | None = None,
+    ):
+        # samples[index]: row of start values, or None to keep the current values
+        start_point_parameters = [
+            self._parameter_index[name] for name in start_point_names
+        ]
+        reusable_fit = (
+            _ReusableNLLFit(self.model, data, fit_options) if reuse_nll else None
+        )
+        for index in indices:
             self.print_func(f"\n\n---------- begin of fit {index} ----------\n")
-            if (not use_initial_values) or (
-                index > 0
-            ):  # use original initial values when index == 0 and use_initial_values
-                for parameter in self.parameter_samples.get(index):
-                    self.model.getParameters(self.data).find(parameter).setVal(
-                        parameter.getVal()
-                    )
-            self.fitresults.append(self.model.fitTo(self.data, **fit_options))
+            if before_fit is not None:
+                before_fit(index, samples[index])
+            if samples[index] is not None:
+                _set_values(start_point_parameters, samples[index])
+            fitresult, metrics = _do_fit(self.model, data, fit_options, reusable_fit)
             self.print_func(f"\n---------- end of fit {index} ----------\n\n")
+            yield index, fitresult, metrics
+
+    def _iter_parallel_fits(
+        self,
+        data: ROOT.RooAbsData,
+        indices: list[int],
+        start_point_names: list[str],
+        samples: list,
+        n_workers: int,
+        fit_options: dict,
+        chunksize: int | None = None,
+        reuse_nll: bool = False,
+    ):
+        # Every worker fits from the model state at call time with only the sampled
+        # parameters overridden, so the results do not depend on how the fits are
+        # distributed among the workers. Note that in serial mode the parameters
+        # which are not sampled carry over from the previous fit instead.
+        import multiprocessing
+        import pickle
+        from concurrent.futures import ProcessPoolExecutor
+
+        if len(indices) == 0:
+            return
+
+        workspace = ROOT.RooWorkspace("repeated_fit_workspace")
+        workspace.Import(self.model, ROOT.RooFit.Silence())
+        workspace.Import(data, ROOT.RooFit.Silence())
+        initargs = (
+            pickle.dumps(workspace),
+            self.model.GetName(),
+            data.GetName(),
+            start_point_names,
+            fit_options,
+            reuse_nll,
+        )
+
+        if chunksize is None:
+            chunksize = max(1, len(indices) // (4 * n_workers))
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_fit_worker,
+            initargs=initargs,
+        ) as executor:
+            try:
+                for index, (fitresult, metrics) in zip(
+                    indices,
+                    executor.map(
+                        _fit_in_worker,
+                        indices,
+                        [samples[index] for index in indices],
+                        chunksize=chunksize,
+                    ),
+                ):
+                    # the workers do not print, since print_func may not be picklable
+                    self.print_func(f"\n\n---------- begin of fit {index} ----------\n")
+                    self.print_func(f"\n---------- end of fit {index} ----------\n\n")
+                    yield index, fitresult, metrics
+            finally:
+                # when the caller stops early, drop the fits not yet started
+                executor.shutdown(wait=True, cancel_futures=True)
+
+    def _get_succeeded_indices(self, allowed_statuses: list[int] | Literal["all"]):
+        import numpy as np
+
+        mask = self.results["index"] >= 0
+        if allowed_statuses != "all":
+            mask &= np.isin(self.results["status"], allowed_statuses)
+        return np.flatnonzero(mask)
+
+    def _get_best_index(
+        self, allowed_statuses: list[int] | Literal["all"]
+    ) -> int | None:
+        import numpy as np
+
+        indices = self._get_succeeded_indices(allowed_statuses)
+        if len(indices) == 0:
+            return None
+        return int(indices[np.argmin(self.results["min_nll"][indices])])
 
     def get_succeeded_results(
         self, *, allowed_statuses: list[int] | Literal["all"] = [0]
     ) -> list[ROOT.RooFitResult]:
-        if allowed_statuses == "all":
-            return self.fitresults
-        else:
-            return [
-                fitresult
-                for fitresult in self.fitresults
-                if fitresult.status() in allowed_statuses
-            ]
+        return [
+            self.fitresults[index]
+            for index in self._get_succeeded_indices(allowed_statuses)
+            if self.fitresults[index] is not None
+        ]
 
     def get_best_result(
         self, *, allowed_statuses: list[int] | Literal["all"] = [0]
     ) -> ROOT.RooFitResult | None:
-        succeeded_results = self.get_succeeded_results(
-            allowed_statuses=allowed_statuses
-        )
-        if len(succeeded_results) > 0:
-            return sorted(succeeded_results, key=lambda x: x.minNll())[0]
-        else:
+        index = self._get_best_index(allowed_statuses)
+        if index is None:
             return None
+        if self.fitresults[index] is None:
+            # rather than silently returning a worse fit
+            raise ValueError(
+                f"the RooFitResult of the best fit {index} was not retained, pass "
+                "keep_statuses matching allowed_statuses together with keep_fitresults"
+            )
+        return self.fitresults[index]
 
     def print_observables(self, *args, **kwargs) -> None:
         for variable in self.model.getObservables(self.data):
             variable.Print(*args, **kwargs)
 
     def print_float_parameters(self, *args, **kwargs) -> None:
-        for variable in self.model.getParameters(self.data):
+        for variable in self._parameters:
             if not variable.isConstant():
                 variable.Print(*args, **kwargs)
 
     def print_const_parameters(self, *args, **kwargs) -> None:
-        for variable in self.model.getParameters(self.data):
+        for variable in self._parameters:
             if variable.isConstant():
                 variable.Print(*args, **kwargs)
 
+    def _print_result(self, index: int) -> None:
+        self.print_func(f"\n********** printing fit result {index} **********\n")
+        self.print_func(f"NLL: {self.results['min_nll'][index]}")
+        self.print_func(f"edm: {self.results['edm'][index]}")
+        self.print_func()
+        if self.fitresults[index] is not None:
+            self.fitresults[index].Print("V")
+        else:
+            self.print_func(f"status: {self.results['status'][index]}")
+            self.print_func("(the full fit result is not retained)")
+        self.print_func(
+            f"\n********** finished printing fit result {index} **********\n"
+        )
+
     def print_all_results(self) -> None:
         self.print_func(f"\n********** printing all fit results **********\n")
-        for i, fitresult in enumerate(self.fitresults):
-            self.print_func(f"\n********** printing fit result {i} **********\n")
-            self.print_func(f"NLL: {fitresult.minNll()}")
-            self.print_func(f"edm: {fitresult.edm()}")
-            self.print_func()
-            fitresult.Print("V")
-            self.print_func(
-                f"\n********** finished printing fit result {i} **********\n"
-            )
+        for index in self._get_succeeded_indices("all"):
+            self._print_result(index)
 
     def print_succeeded_results(self) -> None:
         self.print_func(f"\n********** printing succeeded fit results **********\n")
-        for fitresult in self.get_succeeded_results():
-            index = self.fitresults.index(fitresult)
-            self.print_func(f"\n********** printing fit result {index} **********\n")
-            self.print_func(f"NLL: {fitresult.minNll()}")
-            self.print_func(f"edm: {fitresult.edm()}")
-            self.print_func()
-            fitresult.Print("V")
-            self.print_func(
-                f"\n********** finished printing fit result {index} **********\n"
-            )
+        for index in self._get_succeeded_indices([0]):
+            self._print_result(index)
 
     def print_best_result(self) -> None:
         self.print_func(f"\n********** printing the best fit result **********\n")
-        fitresult = self.get_best_result()
-        if fitresult is not None:
-            index = self.fitresults.index(fitresult)
+        index = self._get_best_index([0])
+        if index is not None:
             self.print_func(f"\nThe best fit result is result {index}. \n")
-            self.print_func(f"\n********** printing fit result {index} **********\n")
-            self.print_func(f"NLL: {fitresult.minNll()}")
-            self.print_func(f"edm: {fitresult.edm()}")
-            self.print_func()
-            fitresult.Print("V")
-            self.print_func(
-                f"\n********** finished printing fit result {index} **********\n"
-            )
+            self._print_result(index)
         else:
             self.print_func("\nNone of the fits has status 0. \n")
 
 
+def _generate_start_points(
+    parameters: list[ROOT.RooAbsArg],
+    num_fits: int,
+    *,
+    strategy: Literal["uniform", "latin-hypercube", "sobol", "halton", "gaussian"],
+    rng,
+):
+    # returns a (num_fits, num_parameters) matrix within the parameter ranges
+    import numpy as np
+
+    low = np.array([parameter.getMin() for parameter in parameters], dtype=np.float64)
+    high = np.array([parameter.getMax() for parameter in parameters], dtype=np.float64)
+    nparams = len(parameters)
+
+    if strategy == "gaussian":
+        # around the current values with the parameter errors as widths
+        from scipy.stats import truncnorm
+
+        center = np.array([parameter.getVal() for parameter in parameters])
+        width = np.array([parameter.getError() for parameter in parameters])
+        # fall back to a sixth of the range for parameters without an error
+        no_error = ~(width > 0)
+        width[no_error] = (high[no_error] - low[no_error]) / 6
+        if not np.isfinite(width).all():
+            raise ValueError(
+                "gaussian start points need an error or a finite range for every "
+                "parameter"
+            )
+        return truncnorm.rvs(
+            (low - center) / width,
+            (high - center) / width,
+            loc=center,
+            scale=width,
+            size=(num_fits, nparams),
+            random_state=rng,
+        )
+
+    if not (np.isfinite(low).all() and np.isfinite(high).all()):
+        raise ValueError(f"{strategy} start points need finite parameter ranges")
+
+    if strategy == "uniform":
+        unit = rng.random((num_fits, nparams))
+    elif strategy in ["latin-hypercube", "sobol", "halton"]:
+        from scipy.stats import qmc
+
+        engine_class = {
+            "latin-hypercube": qmc.LatinHypercube,
+            "sobol": qmc.Sobol,
+            "halton": qmc.Halton,
+        }[strategy]
+        try:
+            engine = engine_class(nparams, rng=rng)
+        except TypeError:  # scipy < 1.15
+            engine = engine_class(nparams, seed=rng)
+        if strategy == "sobol":
+            # Sobol sequences are balanced for powers of 2
+            unit = engine.random_base2(int(np.ceil(np.log2(max(num_fits, 1)))))
+            unit = unit[:num_fits]
+        else:
+            unit = engine.random(num_fits)
+    else:
+        raise ValueError(f"unknown start point strategy: {strategy}")
+    return low + unit * (high - low)
+
+
+def _get_random_subset(data: ROOT.RooDataSet, fraction: float, rng) -> ROOT.RooDataSet:
+    # a random subset of the entries of data, keeping their order and weights
+    if not isinstance(data, ROOT.RooDataSet):
+        raise ValueError("only a RooDataSet can be subsampled")
+    columns = data.to_numpy()
+    mask = rng.random(data.numEntries()) < fraction
+    return ROOT.RooDataSet.from_numpy(
+        {name: column[mask] for name, column in columns.items()},
+        data.get(),
+        name=f"{data.GetName()}_subset",
+        weight_name=data.weightVar().GetName() if data.isWeighted() else None,
+    )
+
+
+def _set_values(parameters: list[ROOT.RooAbsArg], values) -> None:
+    # values: one row of the start point matrix, in the order of parameters
+    for parameter, value in zip(parameters, values.tolist()):
+        parameter.setVal(value)
+
+
+# fitTo options which are passed to createNLL and which configure the minimizer
+_NLL_OPTIONS = {
+    "BatchMode",
+    "CloneData",
+    "ConditionalObservables",
+    "Constrain",
+    "EvalBackend",
+    "Extended",
+    "ExternalConstraints",
+    "GlobalObservables",
+    "GlobalObservablesSource",
+    "GlobalObservablesTag",
+    "IntegrateBins",
+    "NumCPU",
+    "Offset",
+    "Range",
+    "SplitRange",
+    "SumCoefRange",
+}
+_MINIMIZER_OPTIONS = {
+    "EvalErrorWall",
+    "Hesse",
+    "InitialHesse",
+    "MaxCalls",
+    "Minimizer",
+    "Minos",
+    "Optimize",
+    "PrintEvalErrors",
+    "PrintLevel",
+    "RecoverFromUndefinedRegions",
+    "Save",
+    "Strategy",
+    "Timer",
+    "Verbose",
+    "Warnings",
+}
+
+
+class _ReusableNLLFit:
+    # Does the same as model.fitTo(data, **fit_options) on every call of fit(), but
+    # the NLL (with its caches and normalization integrals) is created only once.
+    # The constant term optimization of fitTo (Optimize, 2 by default) is applied
+    # to it once as well, and only redone when the constant parameters change.
+    # The minimizer on top of it is cheap to create and made fresh for every fit,
+    # since a reused minimizer carries state (e.g. of MINOS) over to the next fit.
+
+    def __init__(self, model: ROOT.RooAbsPdf, data: ROOT.RooAbsData, fit_options: dict):
+        options = {
+            key: value
+            for key, value in fit_options.items()
+            # corrected covariances are not supported, but explicitly disabling is fine
+            if not (key in ["SumW2Error", "AsymptoticError"] and not value)
+        }
+        unsupported = sorted(set(options) - _NLL_OPTIONS - _MINIMIZER_OPTIONS)
+        if unsupported:
+            raise ValueError(
+                f"fit options not supported with reuse_nll: {', '.join(unsupported)}"
+            )
+
+        # the NLL is created in the first fit, so that its time is counted there
+        self.nll = None
+        self._constant_values: dict = {}
+        self._parameters = model.getParameters(data)
+        self._model = model
+        self._data = data
+        self.options = options
+        # the defaults are those of fitTo
+        minimizer = options.get("Minimizer", ())
+        if isinstance(minimizer, str):
+            minimizer = (minimizer,)
+        self.minimizer_type = (
+            minimizer[0]
+            if len(minimizer) > 0
+            else ROOT.Math.MinimizerOptions.DefaultMinimizerType()
+        )
+        self.minimizer_algorithm = minimizer[1] if len(minimizer) > 1 else "minuit"
+        self.name = f"fitresult_{model.GetName()}_{data.GetName()}"
+        self.title = (
+            f"Result of fit of p.d.f. {model.GetName()} to dataset {data.GetName()}"
+        )
+
+    def _create_minimizer(self) -> ROOT.RooMinimizer:
+        options = self.options
+        minimizer = ROOT.RooMinimizer(self.nll)
+        minimizer.setMinimizerType(self.minimizer_type)
+        minimizer.setEvalErrorWall(options.get("EvalErrorWall", True))
+        minimizer.setRecoverFromNaNStrength(
+            options.get("RecoverFromUndefinedRegions", 10.0)
+        )
+        minimizer.setPrintEvalErrors(options.get("PrintEvalErrors", 10))
+        if options.get("MaxCalls", -1) > 0:
+            minimizer.setMaxFunctionCalls(options["MaxCalls"])
+        if "PrintLevel" in options:
+            minimizer.setPrintLevel(options["PrintLevel"])
+        if options.get("Verbose", False):
+            minimizer.setVerbose(True)
+        if options.get("Timer", False):
+            minimizer.setProfile(True)
+        if "Strategy" in options:
+            minimizer.setStrategy(options["Strategy"])
+        return minimizer
+
+    def _get_constant_values(self) -> dict:
+        return {
+            parameter.GetName(): (
+                parameter.getVal()
+                if isinstance(parameter, ROOT.RooAbsReal)
+                else parameter.getCurrentIndex()
+            )
+            for parameter in self._parameters
+            if parameter.isConstant()
+        }
+
+    def fit(self) -> tuple[ROOT.RooFitResult, dict]:
+        options = self.options
+        setup_time = time.perf_counter()
+        optimize = options.get("Optimize", 2)
+        constant_values = self._get_constant_values()
+        if self.nll is None:
+            self.nll = self._model.createNLL(
+                self._data,
+                **{key: options[key] for key in options if key in _NLL_OPTIONS},
+            )
+            if optimize:
+                self.nll.constOptimizeTestStatistic(
+                    ROOT.RooAbsArg.Activate, optimize > 1
+                )
+        elif optimize and constant_values != self._constant_values:
+            # as the minimizer does when the constant parameters have changed
+            opcode = (
+                ROOT.RooAbsArg.ValueChange
+                if constant_values.keys() == self._constant_values.keys()
+                else ROOT.RooAbsArg.ConfigChange
+            )
+            self.nll.constOptimizeTestStatistic(opcode, optimize > 1)
+        self._constant_values = constant_values
+        minimizer = self._create_minimizer()
+        minimizer.zeroEvalCount()
+        minimization_time = time.perf_counter()
+        setup_time = minimization_time - setup_time
+        if options.get("InitialHesse", False):
+            minimizer.hesse()
+        minimizer.minimize(self.minimizer_type, self.minimizer_algorithm)
+        if options.get("Hesse", True):
+            minimizer.hesse()
+        minos = options.get("Minos", False)
+        if isinstance(minos, bool):
+            if minos:
+                minimizer.minos()
+        else:
+            # a set of parameters
+            minimizer.minos(minos)
+        minimization_time = time.perf_counter() - minimization_time
+        return minimizer.save(self.name, self.title), {
+            "setup_time": setup_time,
+            "minimization_time": minimization_time,
+            "n_calls": minimizer.evalCounter(),
+        }
+
+
+def _get_max_rss() -> float:
+    # peak resident set size of this process in bytes
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return float("nan")
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # in bytes on macOS, but in KiB elsewhere
+    return float(max_rss if sys.platform == "darwin" else max_rss * 1024)
+
+
+def _do_fit(
+    model: ROOT.RooAbsPdf,
+    data: ROOT.RooAbsData,
+    fit_options: dict,
+    reusable_fit: _ReusableNLLFit | None,
+) -> tuple[ROOT.RooFitResult, dict]:
+    # runs one fit and measures it, see RepeatedFit.get_performance_summary
+    max_rss = _get_max_rss()
+    wall_time = time.perf_counter()
+    cpu_time = time.process_time()
+    if reusable_fit is not None:
+        fitresult, metrics = reusable_fit.fit()
+    else:
+        fitresult = model.fitTo(data, **fit_options)
+        # fitTo does not tell apart the setup and the minimization
+        metrics = {
+            "setup_time": float("nan"),
+            "minimization_time": float("nan"),
+            "n_calls": -1,
+        }
+    metrics["wall_time"] = time.perf_counter() - wall_time
+    metrics["cpu_time"] = time.process_time() - cpu_time
+    metrics["rss_delta"] = _get_max_rss() - max_rss
+    return fitresult, metrics
+
+
+_fit_worker_state: dict = {}
+
+
+def _init_fit_worker(
+    workspace_bytes: bytes,
+    model_name: str,
+    data_name: str,
+    start_point_names: list[str],
+    fit_options: dict,
+    reuse_nll: bool,
+) -> None:
+    import pickle
+
+    workspace = pickle.loads(workspace_bytes)
+    model = workspace.pdf(model_name)
+    data = workspace.data(data_name)
+    parameters = model.getParameters(data)
+    _fit_worker_state.update(
+        workspace=workspace,
+        model=model,
+        data=data,
+        parameters=parameters,
+        initial_parameters=parameters.snapshot(),
+        start_point_parameters=[parameters.find(name) for name in start_point_names],
+        fit_options=fit_options,
+        reusable_fit=_ReusableNLLFit(model, data, fit_options) if reuse_nll else None,
+    )
+
+
+def _fit_in_worker(index: int, sample) -> tuple[ROOT.RooFitResult, dict]:
+    state = _fit_worker_state
+    state["parameters"].assign(state["initial_parameters"])
+    if sample is not None:
+        _set_values(state["start_point_parameters"], sample)
+    return _do_fit(
+        state["model"], state["data"], state["fit_options"], state["reusable_fit"]
+    )
+
+
+def _get_result_dtype(nparams: int, covariance: bool = False):
+    import numpy as np
+
+    fields = [
+        ("index", np.int64),
+        ("status", np.int32),
+        ("cov_qual", np.int32),
+        ("min_nll", np.float64),
+        ("edm", np.float64),
+        ("values", np.float64, (nparams,)),
+        ("errors", np.float64, (nparams,)),
+        ("errors_lo", np.float64, (nparams,)),
+        ("errors_hi", np.float64, (nparams,)),
+    ]
+    if covariance:
+        fields.append(("covariance", np.float64, (nparams, nparams)))
+    return np.dtype(fields)
+
+
+def _get_empty_performance(num_fits: int):
+    import numpy as np
+
+    performance = np.zeros(
+        num_fits,
+        dtype=[
+            ("index", "i8"),
+            ("wall_time", "f8"),
+            ("cpu_time", "f8"),
+            ("setup_time", "f8"),
+            ("minimization_time", "f8"),
+            ("rss_delta", "f8"),
+            ("n_calls", "i8"),
+            ("status_history", "U64"),
+        ],
+    )
+    performance["index"] = -1
+    return performance
+
+
+def _get_empty_results(num_fits: int, nparams: int):
+    import numpy as np
+
+    results = np.zeros(num_fits, dtype=_get_result_dtype(nparams))
+    results["index"] = -1  # marks fits which are not done
+    return results
+
+
+def _get_result_record(
+    fitresult: ROOT.RooFitResult, index: int, parameter_names: list[str], dtype
+):
+    # parameters are matched by name; those not floating in the fit are NaN
+    import numpy as np
+
+    record = np.zeros(1, dtype=dtype)
+    record["index"] = index
+    record["status"] = fitresult.status()
+    record["cov_qual"] = fitresult.covQual()
+    record["min_nll"] = fitresult.minNll()
+    record["edm"] = fitresult.edm()
+
+    final_names = [variable.GetName() for variable in fitresult.floatParsFinal()]
+    positions = {name: i for i, name in enumerate(final_names)}
+    variables = list(fitresult.floatParsFinal())
+    for field in ["values", "errors", "errors_lo", "errors_hi"]:
+        record[field] = np.nan
+    for i, name in enumerate(parameter_names):
+        if name in positions:
+            variable = variables[positions[name]]
+            record["values"][0, i] = variable.getVal()
+            record["errors"][0, i] = variable.getError()
+            record["errors_lo"][0, i] = variable.getErrorLo()
+            record["errors_hi"][0, i] = variable.getErrorHi()
+
+    if "covariance" in dtype.names:
+        record["covariance"] = np.nan
+        matrix = fitresult.covarianceMatrix()
+        if matrix.GetNrows() == len(final_names):
+            rows = [i for i, name in enumerate(parameter_names) if name in positions]
+            cols = [positions[parameter_names[i]] for i in rows]
+            record["covariance"][0][np.ix_(rows, rows)] = convert_root_matrix(
+                matrix, copy=False
+            )[np.ix_(cols, cols)]
+    return record
+
+
+_CHECKPOINT_VERSION = 2
+
+
+class _FitCheckpoint:
+    # Directory layout:
+    #   meta.json:      parameter names, num_fits and whether covariances are stored
+    #   starts.npz:     the start points of all fits
+    #   results.bin:    append-only fixed-size records (see _get_result_dtype)
+    #   fitresults.pkl: append-only stream of pickled (index, RooFitResult), only
+    #                   of the fits retained (at that time) by keep_fitresults, each
+    #                   preceded by its length as a little-endian uint64
+    # A fit counts as done once its record is written to results.bin.
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        start_point_names: list[str],
+        start_points,
+        use_initial,
+        parameter_names: list[str],
+        covariance: bool,
+    ):
+        import json
+        import os
+
+        import numpy as np
+
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "meta.json")
+        starts_path = os.path.join(path, "starts.npz")
+
+        if os.path.exists(meta_path):
+            with open(meta_path) as file:
+                meta = json.load(file)
+            if meta.get("version") != _CHECKPOINT_VERSION:
+                raise ValueError(
+                    f"checkpoint {path} has format version {meta.get('version')}, "
+                    f"expected {_CHECKPOINT_VERSION}"
+                )
+            if meta["num_fits"] != len(start_points) or meta["parameter_names"] != list(
+                parameter_names
+            ):
+                raise ValueError(
+                    f"checkpoint {path} was created for a different repeated fit"
+                )
+            self.parameter_names = meta["parameter_names"]
+            self.covariance = meta["covariance"]
+            with np.load(starts_path) as starts:
+                self.start_point_names = starts["names"].tolist()
+                self.start_points = starts["values"]
+                self.use_initial = starts["use_initial"]
+        else:
+            self.parameter_names = list(parameter_names)
+            self.covariance = covariance
+            self.start_point_names = list(start_point_names)
+            self.start_points = start_points
+            self.use_initial = use_initial
+            np.savez(
+                starts_path,
+                names=np.array(self.start_point_names, dtype=str),
+                values=start_points,
+                use_initial=use_initial,
+            )
+            # meta.json is written last and marks a valid checkpoint
+            with open(meta_path, "w") as file:
+                json.dump(
+                    {
+                        "version": _CHECKPOINT_VERSION,
+                        "num_fits": len(start_points),
+                        "parameter_names": self.parameter_names,
+                        "covariance": self.covariance,
+                    },
+                    file,
+                )
+
+        self.dtype = _get_result_dtype(len(self.parameter_names), self.covariance)
+        self.results_path = os.path.join(path, "results.bin")
+        self.fitresults_path = os.path.join(path, "fitresults.pkl")
+
+    def load(self) -> tuple:
+        # returns the records of the finished fits and a dict of the stored
+        # RooFitResults by fit index
+        import os
+        import pickle
+        import struct
+
+        # drop a partially written record at the end of an interrupted run
+        if os.path.exists(self.results_path):
+            size = os.path.getsize(self.results_path)
+            if size % self.dtype.itemsize != 0:
+                os.truncate(self.results_path, size - size % self.dtype.itemsize)
+        records, _ = load_fit_checkpoint(self.path)
+        done = set(records["index"].tolist())
+
+        fitresults = {}
+        if os.path.exists(self.fitresults_path):
+            torn_offset = None
+            with open(self.fitresults_path, "rb") as file:
+                while True:
+                    offset = file.tell()
+                    header = file.read(8)
+                    if len(header) == 0:
+                        break
+                    size = struct.unpack("<Q", header)[0] if len(header) == 8 else -1
+                    payload = file.read(size) if size >= 0 else b""
+                    if len(payload) != size:
+                        # only the last entry can be partially written; errors in
+                        # complete entries (e.g. from another ROOT version) propagate
+                        torn_offset = offset
+                        break
+                    index, fitresult = pickle.loads(payload)
+                    if index in done:
+                        fitresults[index] = fitresult
+            if torn_offset is not None:
+                os.truncate(self.fitresults_path, torn_offset)
+        return records, fitresults
+
+    def append(
+        self, index: int, fitresult: ROOT.RooFitResult, *, save_fitresult: bool = True
+    ) -> None:
+        import pickle
+        import struct
+
+        if save_fitresult:
+            payload = pickle.dumps((index, fitresult))
+            with open(self.fitresults_path, "ab") as file:
+                file.write(struct.pack("<Q", len(payload)) + payload)
+        record = _get_result_record(fitresult, index, self.parameter_names, self.dtype)
+        with open(self.results_path, "ab") as file:
+            file.write(record.tobytes())
+
+
+def load_fit_checkpoint(path: str):
+    """
+    Load the records of a RepeatedFit checkpoint directory.
+
+    Returns a structured array with one record per finished fit, sorted by fit index
+    (fields index, status, cov_qual, min_nll, edm, values, errors, errors_lo,
+    errors_hi and optionally covariance), and the list of parameter names which
+    correspond to the columns of values and errors.
+    """
+    import json
+    import os
+
+    import numpy as np
+
+    with open(os.path.join(path, "meta.json")) as file:
+        meta = json.load(file)
+    dtype = _get_result_dtype(len(meta["parameter_names"]), meta["covariance"])
+    results_path = os.path.join(path, "results.bin")
+    if os.path.exists(results_path):
+        raw = np.fromfile(results_path, dtype=np.uint8)
+    else:
+        raw = np.zeros(0, dtype=np.uint8)
+    records = raw[: len(raw) - len(raw) % dtype.itemsize].view(dtype)
+    # keep the last record of each fit
+    _, last = np.unique(records["index"][::-1], return_index=True)
+    return records[::-1][last], meta["parameter_names"]
+
+
 def get_params_at_limit(
     fitresult: ROOT.RooFitResult,
     *,
     width: float | tuple[float, float] | Literal["limits", "error"] = "error",
     threshold: float = 3,
 ) -> list:
-    params_at_limit = []
-    for variable in fitresult.floatParsFinal():
-        if width == "limits":
-            width_low = variable.getMax() - variable.getMin()
-            width_high = width_low
-        elif width == "error":
-            width_low = -variable.getErrorLo()
-            width_high = variable.getErrorHi()
-        elif isinstance(width, tuple):
-            width_low = width[0]
-            width_high = width[1]
-        else:
-            width_low = width
-            width_high = width_low
-        if ((variable.getVal() - variable.getMin()) / width_low < threshold) or (
-            (variable.getMax() - variable.getVal()) / width_high < threshold
-        ):
-            params_at_limit.append(variable)
-    return params_at_limit
+    import numpy as np
+
+    variables = list(fitresult.floatParsFinal())
+    at_limit = _is_at_limit(
+        *(
+            np.array([[getter(variable) for variable in variables]])
+            for getter in _LIMIT_GETTERS
+        ),
+        width=width,
+        threshold=threshold,
+    )[0]
+    return [variable for variable, flag in zip(variables, at_limit) if flag]
+
+
+def get_params_at_limit_batch(
+    fitresults: Iterable[ROOT.RooFitResult | None] | RepeatedFit,
+    *,
+    width: float | tuple[float, float] | Literal["limits", "error"] = "error",
+    threshold: float = 3,
+):
+    # get_params_at_limit for many fits at once. fitresults can be a list (with
+    # None for missing fits) or a RepeatedFit, whose results table is used directly
+    # (fits not run are never at limit).
+    # Returns (at_limit, counts, parameter_names): at_limit is a boolean
+    # (fits, parameters) matrix, counts the number of fits at limit per parameter.
+    # Parameters not floating in a fit are never at limit.
+    import numpy as np
+
+    if isinstance(fitresults, RepeatedFit):
+        results = fitresults.results
+        parameter_names = fitresults.result_parameter_names
+        parameters = [fitresults._parameter_index[name] for name in parameter_names]
+        shape = (len(results), 1)
+        arrays = (
+            results["values"],
+            np.tile([parameter.getMin() for parameter in parameters], shape),
+            np.tile([parameter.getMax() for parameter in parameters], shape),
+            results["errors_lo"],
+            results["errors_hi"],
+        )
+    else:
+        # union of the floating parameters, in order of first appearance
+        fitresults = list(fitresults)
+        positions: dict[str, int] = {}
+        rows = []
+        for fitresult in fitresults:
+            row = {}
+            if fitresult is not None:
+                for variable in fitresult.floatParsFinal():
+                    positions.setdefault(variable.GetName(), len(positions))
+                    row[positions[variable.GetName()]] = [
+                        getter(variable) for getter in _LIMIT_GETTERS
+                    ]
+            rows.append(row)
+        parameter_names = list(positions)
+        values = np.full((len(_LIMIT_GETTERS), len(rows), len(positions)), np.nan)
+        for i, row in enumerate(rows):
+            if len(row) > 0:
+                columns = list(row)
+                values[:, i, columns] = np.transpose(list(row.values()))
+        arrays = tuple(values)
+
+    at_limit = _is_at_limit(*arrays, width=width, threshold=threshold)
+    if isinstance(fitresults, RepeatedFit):
+        # fits not run (e.g. after stopping) have zeros in the results table
+        at_limit[fitresults.results["index"] < 0] = False
+    return at_limit, np.count_nonzero(at_limit, axis=0), parameter_names
+
+
+# value, minimum, maximum, lower (negative) and upper error of a RooRealVar
+_LIMIT_GETTERS = (
+    lambda variable: variable.getVal(),
+    lambda variable: variable.getMin(),
+    lambda variable: variable.getMax(),
+    lambda variable: variable.getErrorLo(),
+    lambda variable: variable.getErrorHi(),
+)
+
+
+def _is_at_limit(values, low, high, errors_lo, errors_hi, *, width, threshold):
+    import numpy as np
+
+    if width == "limits":
+        width_low = high - low
+        width_high = width_low
+    elif width == "error":
+        width_low = -errors_lo
+        width_high = errors_hi
+    elif isinstance(width, tuple):
+        width_low = width[0]
+        width_high = width[1]
+    else:
+        width_low = width
+        width_high = width_low
+    # distance / width < threshold without dividing, so that a zero width is
+    # safe; a value at (or beyond) the limit always counts. NaN compares False.
+    distance_low = values - low
+    distance_high = high - values
+    with np.errstate(invalid="ignore"):
+        return (
+            (distance_low <= 0)
+            | (distance_low < threshold * width_low)
+            | (distance_high <= 0)
+            | (distance_high < threshold * width_high)
+        )
 
 
 def set_params_to_fit_result(
-    params: Iterable[ROOT.RooAbsArg],
+    params: Iterable[ROOT.RooAbsArg] | ROOT.RooWorkspace,
     fitresult: ROOT.RooFitResult,
     set_error: bool = True,
     verbose: bool = False,
 ):
+    # params: e.g. a RooArgSet, or a RooWorkspace for all its variables. The fit
+    # result is indexed by name once, so the cost is linear in the parameters.
+    if isinstance(params, ROOT.RooWorkspace):
+        params = params.allVars()
+    float_pars = {
+        variable.GetName(): variable for variable in fitresult.floatParsFinal()
+    }
+    const_pars = {variable.GetName(): variable for variable in fitresult.constPars()}
     for param in params:
-        if (
-            fitresult.floatParsFinal().find(param) != None
-        ):  # "is not None" doesn't work here
-            print(f"setting {param.GetName()} to floatParsFinal value of fit result")
-            param.setVal(fitresult.floatParsFinal().find(param).getVal())
+        name = param.GetName()
+        if name in float_pars:
+            variable = float_pars[name]
+            param.setVal(variable.getVal())
+            if verbose:
+                print_func(f"setting {name} to floatParsFinal value of fit result")
             if set_error:
-                print(
-                    f"setting {param.GetName()} to floatParsFinal error of fit result"
-                )
-                param.setError(fitresult.floatParsFinal().find(param).getError())
-        elif fitresult.constPars().find(param) != None:
-            print(f"setting {param.GetName()} to constPars value of fit result")
-            param.setVal(fitresult.constPars().find(param).getVal())
-        else:
+                param.setError(variable.getError())
+                if verbose:
+                    print_func(f"setting {name} to floatParsFinal error of fit result")
+        elif name in const_pars:
+            param.setVal(const_pars[name].getVal())
             if verbose:
-                print(f"{param.GetName()} not found in fit result")
+                print_func(f"setting {name} to constPars value of fit result")
+        elif verbose:
+            print_func(f"{name} not found in fit result")
 
 
-def convert_root_matrix(matrix: ROOT.TMatrixTBase, **kwargs):
+def convert_root_matrix(matrix: ROOT.TMatrixTBase, *, copy: bool = True, **kwargs):
     import numpy as np
 
     nrows = matrix.GetNrows()
     ncols = matrix.GetNcols()
-    mat = np.zeros(shape=(nrows, ncols), **kwargs)
-    for i in range(nrows):
-        for j in range(ncols):
-            mat[i, j] = matrix[i, j]
-    return mat
+    class_name = matrix.IsA().GetName()
+    storage_dtype = np.float32 if class_name.endswith("<float>") else np.float64
+
+    if class_name.startswith("TMatrixTSparse"):
+        # sparse matrices store only the non-zero elements in CSR format
+        nonzeros = matrix.GetNoElements()
+        kwargs.setdefault("dtype", storage_dtype)
+        mat = np.zeros(shape=(nrows, ncols), **kwargs)
+        if nonzeros > 0:
+            row_index = np.frombuffer(
+                matrix.GetRowIndexArray(), dtype=np.int32, count=nrows + 1
+            )
+            col_index = np.frombuffer(
+                matrix.GetColIndexArray(), dtype=np.int32, count=nonzeros
+            )
+            values = np.frombuffer(
+                matrix.GetMatrixArray(), dtype=storage_dtype, count=nonzeros
+            )
+            rows = np.repeat(np.arange(nrows), np.diff(row_index))
+            mat[rows, col_index] = values
+        return mat
+
+    if nrows * ncols == 0:
+        kwargs.setdefault("dtype", storage_dtype)
+        return np.zeros(shape=(nrows, ncols), **kwargs)
+
+    # TMatrixT and TMatrixTSym both store all elements contiguously in row-major order.
+    # With copy=False the returned array is a view of the ROOT storage (unless a
+    # conversion is requested through kwargs) and is only valid while matrix is alive.
+    storage = np.frombuffer(
+        matrix.GetMatrixArray(), dtype=storage_dtype, count=nrows * ncols
+    ).reshape(nrows, ncols)
+    if copy:
+        return np.array(storage, **kwargs)
+    else:
+        return np.asarray(storage, **kwargs)
+
+
+def convert_fit_result_matrices(
+    fitresults: Iterable[ROOT.RooFitResult],
+    *,
+    kind: Literal["covariance", "correlation"] = "covariance",
+    **kwargs,
+):
+    import numpy as np
+
+    fitresults = list(fitresults)
+    if len(fitresults) == 0:
+        return np.zeros(shape=(0, 0, 0), **kwargs)
+    if any(fitresult is None for fitresult in fitresults):
+        raise ValueError(
+            "fitresults contains None, e.g. fits not retained by keep_fitresults; "
+            "use RepeatedFit.get_succeeded_results instead"
+        )
+
+    nparams = len(fitresults[0].floatParsFinal())
+    mats = np.empty(shape=(len(fitresults), nparams, nparams), **kwargs)
+    for i, fitresult in enumerate(fitresults):
+        if kind == "covariance":
+            matrix = fitresult.covarianceMatrix()
+        elif kind == "correlation":
+            matrix = fitresult.correlationMatrix()
+        else:
+            raise ValueError(f"unknown matrix kind: {kind}")
+        if matrix.GetNrows() != nparams or matrix.GetNcols() != nparams:
+            raise ValueError(
+                f"fit result {i} has a {matrix.GetNrows()}x{matrix.GetNcols()} "
+                f"{kind} matrix, expected {nparams}x{nparams}"
+            )
+        mats[i] = convert_root_matrix(matrix, copy=False)
+    return mats
@@ -3,14 +3,37 @@
 # SPDX-License-Identifier: MIT
 
 
-def kstest(data1, data2, weights1=None, weights2=None, n_permutations=1000):
+def kstest(
+    data1,
+    data2,
+    weights1=None,
+    weights2=None,
+    n_permutations=1000,
+    *,
+    method="exact-permutation",
+    alpha=0.05,
+    error_rate=1e-3,
+    memory_limit=2**28,
+    seed=None,
+    n_jobs=1,
+):
     """
     可带权重的KS检验
 
     参数:
     data1, data2: 样本数据数组
     weights1, weights2: 对应权重数组
-    n_permutations: 置换检验的次数
+    n_permutations: 置换检验的（最大）次数
+    method: p值的计算方法
+        "exact-permutation": 进行全部n_permutations次置换
+        "asymptotic": 用Kish有效样本量和Kolmogorov分布计算渐近p值，不做置换
+        "sequential": 序贯置换，一旦能以不超过error_rate的错误率判断p值大于或小于alpha即停止
+    alpha: "sequential"方法所判断的显著性水平
+    error_rate: "sequential"方法提前停止时判断错误的概率上限
+    memory_limit: 每个线程每批置换所用临时数组的内存上限（字节）
+    seed: 随机数种子（整数、np.random.SeedSequence或np.random.Generator），
+        为None时从全局np.random取种子，因此np.random.seed仍可固定结果
+    n_jobs: 并行计算置换的线程数；对给定的seed，结果与n_jobs无关
 
     返回:
     ks_statistic: KS统计量
@@ -18,58 +41,482 @@ def kstest(data1, data2, weights1=None, weights2=None, n_permutations=1000):
     """
     import numpy as np
 
-    def ks_test_statistic(data1, data2, weights1, weights2):
-        # 计算加权ECDF
-        def weighted_ecdf(data, weights):
-            sorted_idx = np.argsort(data)
-            sorted_data = data[sorted_idx]
-            sorted_weights = weights[sorted_idx]
-            cum_weights = np.cumsum(sorted_weights)
-            return sorted_data, cum_weights / cum_weights[-1]
-
-        # 计算原始KS统计量
-        d1, ecdf1 = weighted_ecdf(data1, weights1)
-        d2, ecdf2 = weighted_ecdf(data2, weights2)
-        all_values = np.concatenate([d1, d2])
-        cdf1 = np.interp(all_values, d1, ecdf1, left=0, right=1)
-        cdf2 = np.interp(all_values, d2, ecdf2, left=0, right=1)
-        ks_statistic = np.max(np.abs(cdf1 - cdf2))
-
-        return ks_statistic
-
-    if weights1 is None:
-        weights1 = np.ones(len(data1))
-    if weights2 is None:
-        weights2 = np.ones(len(data2))
-
-    ks_statistic = ks_test_statistic(data1, data2, weights1, weights2)
-
-    # 置换检验估计p值
+    pooled = _pool_samples(data1, data2, weights1, weights2)
+    ks_statistic = _ks_statistics(pooled["labels"][np.newaxis, :], pooled)[0]
+
+    if method == "asymptotic":
+        return ks_statistic, _ks_asymptotic_p_value(ks_statistic, pooled)
+    elif method == "exact-permutation":
+        looks = [n_permutations]
+    elif method == "sequential":
+        # 检查点按几何级数分布，总错误率按检查次数做Bonferroni分配
+        looks = []
+        look = min(100, n_permutations)
+        while look < n_permutations:
+            looks.append(look)
+            look *= 2
+        looks.append(n_permutations)
+    else:
+        raise ValueError(f"unknown method: {method}")
+
+    # 置换检验估计p值：合并样本只排序一次，每次置换只打乱标签
+    # 置换按固定大小分块，每块使用独立的子随机数流，可以并行计算
+    chunk_seeds = _get_seed_sequence(seed).spawn(
+        -(-n_permutations // _PERMUTATION_CHUNK_SIZE)
+    )
+
+    def count_chunk(chunk):
+        count = 0
+        for perm_labels in _permuted_original_labels(
+            pooled, chunk_seeds, chunk, n_permutations, memory_limit
+        ):
+            perm_ks = _ks_statistics(perm_labels[:, pooled["order"]], pooled)
+            count += int(np.count_nonzero(perm_ks >= ks_statistic))
+        return count
+
+    count = 0
+    done = 0
+    for look in looks:
+        # 检查点都是分块大小的整数倍（最后一个除外）
+        chunks = range(done // _PERMUTATION_CHUNK_SIZE, len(chunk_seeds))
+        chunks = chunks[: -(-(look - done) // _PERMUTATION_CHUNK_SIZE)]
+        count += sum(_map_chunks(count_chunk, chunks, n_jobs))
+        done = look
+        if method == "sequential" and done < n_permutations:
+            lower, upper = _clopper_pearson(count, done, error_rate / len(looks))
+            if upper < alpha or lower > alpha:
+                break
+
+    p_value = (count + 1) / (done + 1)  # 避免p=0
+
+    return ks_statistic, p_value
+
+
+def kstest_batch(
+    data1,
+    data2,
+    weights1=None,
+    weights2=None,
+    n_permutations=1000,
+    *,
+    maxt=False,
+    memory_limit=2**24,
+    seed=None,
+    n_jobs=1,
+):
+    """
+    对多个变量同时做可带权重的KS检验，所有变量共用同一组置换
+
+    参数:
+    data1, data2: 样本数据的二维数组，形状为 (事例数, 变量数)
+    weights1, weights2: 对应的每个事例的权重数组，所有变量共用
+    n_permutations: 置换检验的次数
+    maxt: 是否同时返回按最大统计量（maxT）方法做多重检验修正后的p值
+    memory_limit: 每个线程每批置换所用临时数组的内存上限（字节），较小的批次能留在缓存中，通常更快
+    seed, n_jobs: 同kstest
+
+    返回:
+    ks_statistics: 每个变量的KS统计量
+    p_values: 每个变量的p值，与对每个变量分别调用kstest（相同随机数种子）的结果相同
+    maxt_p_values: （仅当maxt为True时）修正后的p值
+    """
+    import numpy as np
+
+    data1 = np.asarray(data1)
+    data2 = np.asarray(data2)
+    n_variables = data1.shape[1]
+    pooled_list = [
+        _pool_samples(data1[:, i], data2[:, i], weights1, weights2)
+        for i in range(n_variables)
+    ]
+    ks_statistics = np.array(
+        [
+            _ks_statistics(pooled["labels"][np.newaxis, :], pooled)[0]
+            for pooled in pooled_list
+        ]
+    )
+
+    # 每批置换后的第一组权重（原始顺序）对所有变量共用，只需按各变量的排序重排
+    weights = np.concatenate(
+        [
+            np.ones(len(data1)) if weights1 is None else np.asarray(weights1),
+            np.ones(len(data2)) if weights2 is None else np.asarray(weights2),
+        ]
+    ).astype(np.float64)
+    chunk_seeds = _get_seed_sequence(seed).spawn(
+        -(-n_permutations // _PERMUTATION_CHUNK_SIZE)
+    )
+
+    def count_chunk(chunk):
+        counts = np.zeros(n_variables, dtype=np.int64)
+        maxt_counts = np.zeros(n_variables, dtype=np.int64)
+        for labels in _permuted_original_labels(
+            pooled_list[0], chunk_seeds, chunk, n_permutations, memory_limit
+        ):
+            perm_weights = np.multiply(labels, weights)
+            buffer = np.empty_like(perm_weights)
+            max_ks = np.zeros(len(labels))
+            for i, pooled in enumerate(pooled_list):
+                np.take(perm_weights, pooled["order"], axis=1, out=buffer)
+                perm_ks = _ks_statistics_from_weights(buffer, pooled)
+                counts[i] += np.count_nonzero(perm_ks >= ks_statistics[i])
+                np.maximum(max_ks, perm_ks, out=max_ks)
+            maxt_counts += np.count_nonzero(
+                max_ks[:, np.newaxis] >= ks_statistics[np.newaxis, :], axis=0
+            )
+        return counts, maxt_counts
+
+    chunk_counts = list(_map_chunks(count_chunk, range(len(chunk_seeds)), n_jobs))
+    counts = sum(counts for counts, _ in chunk_counts)
+    maxt_counts = sum(maxt_counts for _, maxt_counts in chunk_counts)
+
+    p_values = (counts + 1) / (n_permutations + 1)
+    if maxt:
+        return ks_statistics, p_values, (maxt_counts + 1) / (n_permutations + 1)
+    return ks_statistics, p_values
+
+
+def two_sample_test(
+    data1,
+    data2,
+    weights1=None,
+    weights2=None,
+    n_permutations=1000,
+    *,
+    statistics=("ks", "cvm", "ad", "chi2"),
+    bins=10,
+    memory_limit=2**28,
+    seed=None,
+    n_jobs=1,
+):
+    """
+    可带权重的双样本检验，在同一次排序和同一组置换上计算多个统计量
+
+    参数:
+    data1, data2: 样本数据数组
+    weights1, weights2: 对应权重数组
+    n_permutations: 置换检验的次数
+    statistics: 要计算的统计量，可以是以下的任意子集
+        "ks": Kolmogorov-Smirnov统计量
+        "cvm": Cramér-von Mises统计量
+        "ad": Anderson-Darling统计量
+        "chi2": 以合并样本的等权重分位数分bin的卡方统计量
+    bins: "chi2"所用的bin数目
+    memory_limit, seed, n_jobs: 同kstest；给定seed时"ks"的p值与kstest的结果相同
+
+    返回:
+    statistic_values: 统计量名称到统计量的字典
+    p_values: 统计量名称到p值的字典
+    """
+    import numpy as np
+
+    statistics = list(statistics)
+    for name in statistics:
+        if name not in _TWO_SAMPLE_STATISTICS:
+            raise ValueError(f"unknown statistic: {name}")
+
+    pooled = _pool_samples(data1, data2, weights1, weights2)
+    if "chi2" in statistics:
+        pooled["chi2_edges"] = _get_quantile_bin_edges(pooled, bins)
+    statistic_values = {
+        name: float(values[0])
+        for name, values in _two_sample_statistics_from_weights(
+            np.multiply(pooled["labels"][np.newaxis, :], pooled["weights"]),
+            pooled,
+            statistics,
+        ).items()
+    }
+
+    chunk_seeds = _get_seed_sequence(seed).spawn(
+        -(-n_permutations // _PERMUTATION_CHUNK_SIZE)
+    )
+
+    def count_chunk(chunk):
+        counts = dict.fromkeys(statistics, 0)
+        for perm_labels in _permuted_original_labels(
+            pooled, chunk_seeds, chunk, n_permutations, memory_limit
+        ):
+            perm_values = _two_sample_statistics_from_weights(
+                np.multiply(perm_labels[:, pooled["order"]], pooled["weights"]),
+                pooled,
+                statistics,
+            )
+            for name in statistics:
+                counts[name] += int(
+                    np.count_nonzero(perm_values[name] >= statistic_values[name])
+                )
+        return counts
+
+    counts = dict.fromkeys(statistics, 0)
+    for chunk_counts in _map_chunks(count_chunk, range(len(chunk_seeds)), n_jobs):
+        for name in statistics:
+            counts[name] += chunk_counts[name]
+    p_values = {name: (counts[name] + 1) / (n_permutations + 1) for name in statistics}
+
+    return statistic_values, p_values
+
+
+def kstest_binned(
+    data1,
+    data2,
+    weights1=None,
+    weights2=None,
+    *,
+    bins=2**16,
+    range=None,
+    chunk_size=2**20,
+):
+    """
+    用精细分bin的带权ECDF近似计算KS检验，内存占用与事例数无关，适用于非常大的样本
+
+    参数:
+    data1, data2: 样本数据数组（可以是np.memmap），或者逐块产生数据的迭代器
+        （例如uproot.iterate），每块为数据数组或 (数据, 权重) 元组
+    weights1, weights2: 对应权重数组，数据为迭代器时须放在每块的元组中
+    bins: bin的数目，或者bin的边界数组
+    range: bin的范围，数据为迭代器且bins为数目时必须给出；范围外的事例计入两侧的溢出bin
+    chunk_size: 数据为数组时每块的事例数
+
+    返回:
+    ks_statistic: 分bin后的KS统计量
+    p_value: 用Kish有效样本量和Kolmogorov分布计算的渐近p值
+    error: KS统计量的误差上限（权重非负时），精确值在 [ks_statistic, ks_statistic + error] 内
+    """
+    import numpy as np
+
+    from .hist import _is_stream, histogram
+
+    if np.ndim(bins) == 1:
+        edges = np.asarray(bins, dtype=np.float64)
+    else:
+        if range is None:
+            if _is_stream(data1) or _is_stream(data2):
+                raise ValueError(
+                    "range is required for iterators of chunks unless bin edges are given"
+                )
+            range = (
+                min(np.min(data1), np.min(data2)),
+                max(np.max(data1), np.max(data2)),
+            )
+        edges = np.histogram_bin_edges([], bins, range=range)
+    # 两侧加上溢出bin，使所有事例都计入ECDF
+    edges = np.concatenate([[-np.inf], edges, [np.inf]])
+
+    sumw1, sumw21, _ = histogram(data1, edges, weights=weights1, chunk_size=chunk_size)
+    sumw2, sumw22, _ = histogram(data2, edges, weights=weights2, chunk_size=chunk_size)
+    total1 = np.sum(sumw1)
+    total2 = np.sum(sumw2)
+    mass1 = sumw1 / total1
+    mass2 = sumw2 / total2
+
+    # bin边界上的ECDF是精确的，bin内部的偏差不超过该bin的概率质量
+    ks_statistic = float(np.max(np.abs(np.cumsum(mass1) - np.cumsum(mass2))))
+    error = float(np.max(np.maximum(mass1, mass2)))
+
+    n1 = total1**2 / np.sum(sumw21)
+    n2 = total2**2 / np.sum(sumw22)
+    p_value = _kolmogorov_p_value(ks_statistic, n1, n2)
+
+    return ks_statistic, p_value, error
+
+
+def _effective_sample_size(weights):
+    # Kish有效样本量
+    import numpy as np
+
+    return np.sum(weights) ** 2 / np.sum(weights**2)
+
+
+def _ks_asymptotic_p_value(ks_statistic, pooled):
+    labels = pooled["labels"]
+    n1 = _effective_sample_size(pooled["weights"][labels])
+    n2 = _effective_sample_size(pooled["weights"][~labels])
+    return _kolmogorov_p_value(ks_statistic, n1, n2)
+
+
+def _kolmogorov_p_value(ks_statistic, n1, n2):
+    import numpy as np
+    from scipy.special import kolmogorov
+
+    en = n1 * n2 / (n1 + n2)
+    return float(kolmogorov(np.sqrt(en) * ks_statistic))
+
+
+def _clopper_pearson(count, n, error_rate):
+    # 二项分布比例的Clopper-Pearson置信区间
+    from scipy.stats import beta
+
+    lower = beta.ppf(error_rate / 2, count, n - count + 1) if count > 0 else 0.0
+    upper = beta.ppf(1 - error_rate / 2, count + 1, n - count) if count < n else 1.0
+    return lower, upper
+
+
+def _pool_samples(data1, data2, weights1, weights2):
+    # 合并两组样本并排序一次，之后所有统计量都在排序后的合并样本上计算
+    import numpy as np
+
+    data1 = np.asarray(data1)
+    data2 = np.asarray(data2)
+    weights1 = np.ones(len(data1)) if weights1 is None else np.asarray(weights1)
+    weights2 = np.ones(len(data2)) if weights2 is None else np.asarray(weights2)
+
     combined_data = np.concatenate([data1, data2])
-    combined_weights = np.concatenate([weights1, weights2])
+    combined_weights = np.concatenate([weights1, weights2]).astype(np.float64)
     n1 = len(data1)
-    count = 0
 
-    for _ in range(n_permutations):
-        # 打乱标签
-        perm_idx = np.random.permutation(len(combined_data))
-        perm_data = combined_data[perm_idx]
-        perm_weights = combined_weights[perm_idx]
+    # order[i]: 排序后第i个位置对应的原始事例
+    order = np.argsort(combined_data, kind="stable")
+    sorted_data = combined_data[order]
+    sorted_weights = combined_weights[order]
+    labels = order < n1
+    # ECDF只在相同取值的最后一个位置上取值（处理并列值）
+    last = np.append(sorted_data[1:] != sorted_data[:-1], True)
 
-        # 分割为两组
-        perm_data1 = perm_data[:n1]
-        perm_weights1 = perm_weights[:n1]
-        perm_data2 = perm_data[n1:]
-        perm_weights2 = perm_weights[n1:]
+    return {
+        "n1": n1,
+        "order": order,
+        "labels": labels,
+        "weights": sorted_weights,
+        "cum_weights": np.cumsum(sorted_weights),
+        "last": last,
+        "all_last": bool(last.all()),
+    }
 
-        # 计算置换后的KS统计量
-        perm_ks = ks_test_statistic(
-            perm_data1, perm_data2, perm_weights1, perm_weights2
-        )
 
-        if perm_ks >= ks_statistic:
-            count += 1
+# 每个子随机数流对应的置换数，固定不变以保证结果与n_jobs、memory_limit无关
+_PERMUTATION_CHUNK_SIZE = 100
 
-    p_value = (count + 1) / (n_permutations + 1)  # 避免p=0
 
-    return ks_statistic, p_value
+def _get_seed_sequence(seed):
+    import numpy as np
+
+    if seed is None:
+        # 从全局随机数状态取熵
+        return np.random.SeedSequence(np.random.randint(0, 2**32, size=4).tolist())
+    elif isinstance(seed, np.random.SeedSequence):
+        return seed
+    elif isinstance(seed, np.random.Generator):
+        return np.random.SeedSequence(seed.integers(0, 2**32, size=4).tolist())
+    else:
+        return np.random.SeedSequence(seed)
+
+
+def _map_chunks(function, chunks, n_jobs):
+    # 按顺序返回每个分块的结果
+    if n_jobs == 1 or len(chunks) <= 1:
+        return map(function, chunks)
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        return list(executor.map(function, chunks))
+
+
+def _permuted_original_labels(pooled, chunk_seeds, chunk, n_permutations, memory_limit):
+    # 按批生成第chunk块置换后的标签（原始顺序，前n1个事例为第一组），
+    # 每批大小受memory_limit限制
+    import numpy as np
+
+    n = len(pooled["weights"])
+    rng = np.random.default_rng(chunk_seeds[chunk])
+    start = chunk * _PERMUTATION_CHUNK_SIZE
+    size = min(_PERMUTATION_CHUNK_SIZE, n_permutations - start)
+    # 每个置换大约需要三个长度为n的float64临时数组
+    batch_size = max(1, memory_limit // (3 * 8 * n))
+    for batch_start in range(0, size, batch_size):
+        perm_labels = np.zeros((min(batch_size, size - batch_start), n), dtype=bool)
+        perm_labels[:, : pooled["n1"]] = True
+        rng.permuted(perm_labels, axis=1, out=perm_labels)
+        yield perm_labels
+
+
+def _ks_statistics(labels, pooled):
+    # labels: (置换数, n) 的布尔数组，True表示属于第一组
+    import numpy as np
+
+    return _ks_statistics_from_weights(np.multiply(labels, pooled["weights"]), pooled)
+
+
+def _ks_statistics_from_weights(cum1, pooled):
+    # cum1: (置换数, n) 的数组，为第一组事例的权重（第二组为0），会被原地修改
+    import numpy as np
+
+    cum_weights = pooled["cum_weights"]
+
+    # 第一组的累积权重，第二组的累积权重为总累积权重减去第一组
+    np.cumsum(cum1, axis=1, out=cum1)
+    total1 = cum1[:, -1:]
+    total2 = cum_weights[-1] - total1
+
+    # F1 - F2 = cum1 / W1 - (cum - cum1) / W2 = cum1 * (1/W1 + 1/W2) - cum / W2
+    cum1 *= 1 / total1 + 1 / total2
+    cum1 -= cum_weights / total2
+    np.abs(cum1, out=cum1)
+    if pooled["all_last"]:
+        return np.max(cum1, axis=1)
+    else:
+        return np.max(cum1[:, pooled["last"]], axis=1)
+
+
+_TWO_SAMPLE_STATISTICS = ("ks", "cvm", "ad", "chi2")
+
+
+def _get_quantile_bin_edges(pooled, bins):
+    # 合并样本的等权重分位数，取在相同取值的最后一个位置上，返回每个bin最后一个事例的位置
+    import numpy as np
+
+    cum_weights = pooled["cum_weights"]
+    last_positions = np.flatnonzero(pooled["last"])
+    quantiles = cum_weights[-1] * np.arange(1, bins) / bins
+    indices = np.searchsorted(cum_weights[last_positions], quantiles)
+    return np.unique(np.append(last_positions[indices], len(cum_weights) - 1))
+
+
+def _two_sample_statistics_from_weights(cum1, pooled, statistics):
+    # cum1: (置换数, n) 的数组，为第一组事例的权重（第二组为0），会被原地修改
+    # 所有统计量共用同一次累积求和
+    import numpy as np
+
+    cum_weights = pooled["cum_weights"]
+    total = cum_weights[-1]
+    np.cumsum(cum1, axis=1, out=cum1)
+    total1 = cum1[:, -1:].copy()
+    total2 = total - total1
+    values = {}
+
+    if "chi2" in statistics:
+        # 两样本卡方：W1 W2 sum((s1/W1 - s2/W2)^2 / (s1 + s2))
+        edges = pooled["chi2_edges"]
+        bin_cum1 = cum1[:, edges]
+        bin_cum = cum_weights[edges]
+        s1 = np.diff(bin_cum1, axis=1, prepend=0)
+        s = np.diff(bin_cum, prepend=0)
+        difference = s1 / total1 - (s - s1) / total2
+        values["chi2"] = (total1 * total2)[:, 0] * np.sum(difference**2 / s, axis=1)
+
+    # F1 - F2，只在相同取值的最后一个位置上取值
+    cum1 *= 1 / total1 + 1 / total2
+    cum1 -= cum_weights / total2
+    last = pooled["last"]
+    difference = cum1 if pooled["all_last"] else cum1[:, last]
+
+    if "ks" in statistics:
+        values["ks"] = np.max(np.abs(difference), axis=1)
+    if "cvm" in statistics or "ad" in statistics:
+        # 合并样本ECDF H的每个取值上的概率质量
+        h = cum_weights[last] / total
+        mass = np.diff(h, prepend=0)
+        scale = (total1 * total2)[:, 0] / total
+        np.square(difference, out=difference)
+        if "cvm" in statistics:
+            values["cvm"] = scale * (difference @ mass)
+        if "ad" in statistics:
+            h_variance = h * (1 - h)
+            ad_weights = np.divide(
+                mass,
+                h_variance,
+                out=np.zeros_like(mass),
+                where=h_variance > 0,
+            )
+            values["ad"] = scale * (difference @ ad_weights)
+
+    return {name: values[name] for name in statistics}
@@ -5,7 +5,11 @@
 import numpy as np
 import ROOT
 
-from src.data_analysis_helper.root import convert_root_matrix
+from src.data_analysis_helper.root import (
+    RepeatedFit,
+    convert_fit_result_matrices,
+    convert_root_matrix,
+)
 
 
 def test_convert_root_matrix():
@@ -19,3 +23,64 @@ def test_convert_root_matrix():
     for i in range(nrows):
         for j in range(ncols):
             assert mat[i, j] == i + j
+
+
+def test_convert_root_matrix_view():
+    matrix = ROOT.TMatrixD(2, 3)
+    mat_copy = convert_root_matrix(matrix)
+    mat_view = convert_root_matrix(matrix, copy=False)
+    matrix[1, 2] = 5
+    assert mat_copy[1, 2] == 0
+    assert mat_view[1, 2] == 5
+
+    matrix_float = ROOT.TMatrixF(2, 3)
+    matrix_float[0, 1] = 1.5
+    mat = convert_root_matrix(matrix_float)
+    assert mat.dtype == np.float32
+    assert mat[0, 1] == 1.5
+    assert convert_root_matrix(matrix_float, dtype=np.float64).dtype == np.float64
+
+
+def test_convert_root_matrix_sym_and_sparse():
+    nrows = 4
+    matrix_sym = ROOT.TMatrixDSym(nrows)
+    for i in range(nrows):
+        for j in range(i, nrows):
+            matrix_sym[i, j] = i * j + 1
+            matrix_sym[j, i] = i * j + 1
+    mat_sym = convert_root_matrix(matrix_sym)
+    assert (mat_sym == mat_sym.T).all()
+    for i in range(nrows):
+        for j in range(nrows):
+            assert mat_sym[i, j] == i * j + 1
+
+    matrix = ROOT.TMatrixD(3, 5)
+    matrix[0, 4] = 1
+    matrix[2, 0] = 2
+    matrix[2, 3] = 3
+    mat_sparse = convert_root_matrix(ROOT.TMatrixDSparse(matrix))
+    assert (mat_sparse == convert_root_matrix(matrix)).all()
+    assert (convert_root_matrix(ROOT.TMatrixDSparse(3, 5)) == 0).all()
+
+
+def test_convert_fit_result_matrices():
+    x = ROOT.RooRealVar("x", "x", -5, 5)
+    mean = ROOT.RooRealVar("mean", "mean", 0, -3, 3)
+    sigma = ROOT.RooRealVar("sigma", "sigma", 1, 0.5, 3)
+    pdf = ROOT.RooGaussian("gauss", "gauss", x, mean, sigma)
+
+    data = pdf.generate(x, 1000)
+    repeated_fit = RepeatedFit(model=pdf, data=data, num_fits=3)
+    repeated_fit.do_repeated_fit()
+
+    covariances = convert_fit_result_matrices(repeated_fit.fitresults)
+    correlations = convert_fit_result_matrices(
+        repeated_fit.fitresults, kind="correlation"
+    )
+    assert covariances.shape == (3, 2, 2)
+    assert correlations.shape == (3, 2, 2)
+    for i, fitresult in enumerate(repeated_fit.fitresults):
+        assert (
+            covariances[i] == convert_root_matrix(fitresult.covarianceMatrix())
+        ).all()
+        assert np.allclose(np.diagonal(correlations[i]), 1)
@@ -2,9 +2,14 @@
 #
 # SPDX-License-Identifier: MIT
 
+import numpy as np
 import ROOT
 
-from src.data_analysis_helper.root import RepeatedFit, get_params_at_limit
+from src.data_analysis_helper.root import (
+    RepeatedFit,
+    get_params_at_limit,
+    get_params_at_limit_batch,
+)
 
 
 def test_get_params_at_limit_one_param_at_limit():
@@ -76,3 +81,81 @@ def test_get_params_at_limit_one_param_at_limit_custom_width():
     ]
     for list_params_at_limit in lists_params_at_limit:
         assert len(list_params_at_limit) == 1
+
+
+def test_get_params_at_limit_batch():
+    x = ROOT.RooRealVar("x", "x", -5, 5)
+    mean = ROOT.RooRealVar("mean", "mean", 4, -3, 3)
+    sigma = ROOT.RooRealVar("sigma", "sigma", 1, 0.5, 3)
+    pdf = ROOT.RooGaussian("gauss", "gauss", x, mean, sigma)
+
+    data = pdf.generate(x, 10000)
+    repeated_fit = RepeatedFit(model=pdf, data=data, num_fits=10)
+    repeated_fit.do_repeated_fit()
+
+    for width, threshold in [
+        ("error", 3),
+        ("limits", 0.05),
+        (1, 0.1),
+        ((0.1, 0.1), 0.3),
+    ]:
+        expected = np.array(
+            [
+                [
+                    name
+                    in [
+                        variable.GetName()
+                        for variable in get_params_at_limit(
+                            fitresult, width=width, threshold=threshold
+                        )
+                    ]
+                    for name in ["mean", "sigma"]
+                ]
+                for fitresult in repeated_fit.fitresults
+            ]
+        )
+        for fitresults in [repeated_fit.fitresults, repeated_fit]:
+            at_limit, counts, names = get_params_at_limit_batch(
+                fitresults, width=width, threshold=threshold
+            )
+            assert names == ["mean", "sigma"]
+            np.testing.assert_array_equal(at_limit, expected)
+            np.testing.assert_array_equal(counts, expected.sum(axis=0))
+
+    # missing fits are never at limit
+    at_limit, counts, names = get_params_at_limit_batch(
+        [None] + repeated_fit.fitresults[1:]
+    )
+    assert not at_limit[0].any()
+    assert counts[names.index("mean")] == 9
+
+    # zero widths do not divide by zero
+    at_limit, counts, names = get_params_at_limit_batch(
+        repeated_fit, width=0, threshold=3
+    )
+    assert at_limit.shape == (10, 2)
+    assert counts[names.index("sigma")] == 0
+    assert all(
+        variable.GetName() == "mean"
+        for variable in get_params_at_limit(repeated_fit.fitresults[0], width=0)
+    )
+
+
+def test_get_params_at_limit_batch_stopping():
+    from src.data_analysis_helper.root import StoppingPolicy
+
+    x = ROOT.RooRealVar("x", "x", -5, 5)
+    mean = ROOT.RooRealVar("mean", "mean", 0, -3, 3)
+    sigma = ROOT.RooRealVar("sigma", "sigma", 1, 0, 3)
+    pdf = ROOT.RooGaussian("gauss", "gauss", x, mean, sigma)
+
+    data = pdf.generate(x, 1000)
+    repeated_fit = RepeatedFit(model=pdf, data=data, num_fits=20, random_seed=0)
+    repeated_fit.do_repeated_fit(stopping=StoppingPolicy(reproduce=3))
+    done = repeated_fit.results["index"] >= 0
+    assert not done.all()
+
+    # the fits not run have zeros in the results table, but are never at limit
+    at_limit, counts, names = get_params_at_limit_batch(repeated_fit)
+    assert not at_limit[~done].any()
+    assert (counts == 0).all()
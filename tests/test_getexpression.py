@@ -3,10 +3,16 @@
 # SPDX-License-Identifier: MIT
 
 from src.data_analysis_helper.expr import (
+    ExpressionGraph,
+    book_kinematics,
     get_clone_rejection_expression,
+    get_clone_rejection_function,
     get_invariant_mass_expression,
+    get_invariant_mass_function,
     get_p_expression,
+    get_p_function,
     get_pe_expression,
+    get_pe_function,
 )
 
 
@@ -65,3 +71,274 @@ def test_get_p_expression():
             "sqrt": sqrt,
         },
     ) == sqrt(14)
+
+
+def _eval_numpy(expression, columns):
+    import numpy as np
+
+    return eval(
+        expression.replace(" && ", " & "),
+        {
+            **columns,
+            "sqrt": np.sqrt,
+            "pow": np.power,
+            "acos": np.arccos,
+            "abs": np.abs,
+        },
+    )
+
+
+def _random_columns(prefixes, components, n=1000):
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    columns = {
+        f"{prefix}{component}": rng.normal(0, 1000, n)
+        for prefix in prefixes
+        for component in components
+    }
+    for prefix in prefixes:
+        for component in ["_PE", "_E", "_TRUEP_E"]:
+            if f"{prefix}{component}" in columns:
+                # keep the particles physical
+                columns[f"{prefix}{component}"] = (
+                    np.abs(columns[f"{prefix}{component}"]) + 3000
+                )
+    return columns
+
+
+def test_get_invariant_mass_function():
+    import numpy as np
+
+    prefixes = ["pip", "pim", "Kp"]
+    for suffix_PxPyPzE, components in [
+        ("PXPYPZPE", ["_PX", "_PY", "_PZ", "_PE"]),
+        ("TRUEP", ["_TRUEP_X", "_TRUEP_Y", "_TRUEP_Z", "_TRUEP_E"]),
+    ]:
+        columns = _random_columns(prefixes, components)
+        for squared in [False, True]:
+            assert np.allclose(
+                get_invariant_mass_function(
+                    prefixes, suffix_PxPyPzE=suffix_PxPyPzE, squared=squared
+                )(columns),
+                _eval_numpy(
+                    get_invariant_mass_expression(
+                        prefixes, suffix_PxPyPzE=suffix_PxPyPzE, squared=squared
+                    ),
+                    columns,
+                ),
+                equal_nan=True,
+            )
+
+
+def test_get_pe_and_p_function():
+    import numpy as np
+
+    columns = _random_columns(["pi"], ["_PX", "_PY", "_PZ", "_M"])
+    assert np.allclose(
+        get_pe_function("pi", mass_hypothesis=139.57)(columns),
+        _eval_numpy(get_pe_expression("pi", mass_hypothesis=139.57), columns),
+    )
+    assert np.allclose(
+        get_pe_function("pi", mass_hypothesis="pi_M")(columns),
+        _eval_numpy(get_pe_expression("pi", mass_hypothesis="pi_M"), columns),
+    )
+    assert np.allclose(
+        get_pe_function("pi")(columns),
+        _eval_numpy(get_pe_expression("pi"), columns),
+    )
+    assert np.allclose(
+        get_p_function("pi")(columns),
+        _eval_numpy(get_p_expression("pi"), columns),
+    )
+
+
+def test_get_clone_rejection_function():
+    import numpy as np
+
+    prefixes = ["pi1", "pi2", "pi3", "pi4"]
+    columns = _random_columns(prefixes, ["_PX", "_PY", "_PZ"])
+    for threshold in [0.5, "1.5"]:
+        result = get_clone_rejection_function(prefixes, threshold)(columns)
+        assert result.dtype == bool
+        assert 0 < np.count_nonzero(result) < len(result)
+        assert (
+            result
+            == _eval_numpy(get_clone_rejection_expression(prefixes, threshold), columns)
+        ).all()
+
+    # each (float32) column is read and converted only once per call
+    class CountingColumns(dict):
+        def __init__(self, *args):
+            super().__init__(*args)
+            self.reads = []
+
+        def __getitem__(self, name):
+            self.reads.append(name)
+            return super().__getitem__(name)
+
+    columns_float32 = CountingColumns(
+        {name: column.astype(np.float32) for name, column in columns.items()}
+    )
+    result = get_clone_rejection_function(prefixes, 0.5)(columns_float32)
+    assert sorted(columns_float32.reads) == sorted(columns)
+    expected = get_clone_rejection_function(prefixes, 0.5)(
+        {name: column.astype(np.float64) for name, column in columns_float32.items()}
+    )
+    assert (result == expected).all()
+
+
+def test_expression_graph():
+    import numpy as np
+    import ROOT
+
+    prefixes = ["pi1", "pi2", "pi3"]
+    columns = _random_columns(
+        prefixes,
+        ["_PX", "_PY", "_PZ", "_PE", "_TRUEP_X", "_TRUEP_Y", "_TRUEP_Z", "_TRUEP_E"],
+        n=100,
+    )
+
+    graph = ExpressionGraph()
+    mass = graph.add_invariant_mass(prefixes[:2])
+    mass_squared = graph.add_invariant_mass(prefixes[:2], squared=True)
+    mass_all = graph.add_invariant_mass(prefixes, name="mass_all")
+    p = graph.add_p("pi1")
+    clone_rejection = graph.add_clone_rejection(prefixes, 0.5)
+    assert graph.add_p("pi1") == p
+    assert graph.add_p("pi1", name="pi1_P_alias") == "pi1_P_alias"
+    # defining an alias again with the same expression is a no-op
+    assert graph.add_p("pi1", name="pi1_P_alias") == "pi1_P_alias"
+    # the reco and the true quantities get distinct default names
+    assert graph.add_invariant_mass(prefixes[:2], suffix_PxPyPzE="TRUEP") == (
+        "expr_pi1_pi2_M_TRUEP"
+    )
+    assert graph.add_p("pi1", suffix_PxPyPz="TRUEP") == "expr_pi1_P_TRUEP"
+    names = [name for name, _ in graph.get_definitions()]
+    # each momentum magnitude and component sum is defined only once
+    assert len(names) == len(set(names))
+    assert len([name for name in names if name.endswith("_P")]) == 3
+    assert len([name for name in names if name.endswith("_P_TRUEP")]) == 1
+
+    rdf = graph.define_on(ROOT.RDF.FromNumpy(columns))
+    results = rdf.AsNumpy([mass, mass_squared, mass_all, clone_rejection])
+    for name, expression in [
+        (mass, get_invariant_mass_expression(prefixes[:2])),
+        (mass_squared, get_invariant_mass_expression(prefixes[:2], squared=True)),
+        (mass_all, get_invariant_mass_expression(prefixes)),
+        (clone_rejection, get_clone_rejection_expression(prefixes, 0.5)),
+    ]:
+        assert np.allclose(
+            results[name], _eval_numpy(expression, columns), equal_nan=True
+        )
+
+    variables = [ROOT.RooRealVar(name, name, 0) for name in columns]
+    for variable in variables:
+        variable.setVal(columns[variable.GetName()][0])
+    formula_vars = graph.build_roofit(variables)
+    assert np.isclose(formula_vars[mass_all].getVal(), results[mass_all][0])
+
+
+def test_book_kinematics():
+    import numpy as np
+    import ROOT
+
+    prefixes = ["pi1", "pi2", "pi3"]
+    columns = _random_columns(prefixes, ["_PX", "_PY", "_PZ", "_PE", "_E"], n=100)
+
+    rdf, booked = book_kinematics(
+        ROOT.RDF.FromNumpy(columns),
+        prefixes,
+        invariant_masses=2,
+        clone_rejection=0.5,
+    )
+    rdf_hypothesis, booked_hypothesis = book_kinematics(
+        ROOT.RDF.FromNumpy(columns),
+        prefixes,
+        p=False,
+        mass_hypotheses={"pi1": 493.677},
+        invariant_masses=[["pi1", "pi2", "pi3"]],
+    )
+    results = rdf.AsNumpy(list(booked.values()))
+    results_hypothesis = rdf_hypothesis.AsNumpy(list(booked_hypothesis.values()))
+
+    assert len(booked) == 3 + 3 + 1
+    assert len(booked_hypothesis) == 2
+    assert booked[("p", "pi1")] == "expr_pi1_P"
+    assert booked[("m", ("pi1", "pi3"))] == "expr_pi1_pi3_M"
+    assert booked["clone_rejection"] == "expr_pi1_pi2_pi3_clone_rejection"
+    assert booked_hypothesis[("pe", "pi1", 493.677)] == "expr_pi1_PE_493_677"
+
+    # the true momenta can be booked on the same node
+    rdf_true, booked_true = book_kinematics(
+        rdf,
+        prefixes,
+        invariant_masses=2,
+        clone_rejection=0.5,
+        suffix_PxPyPzE=["_PX", "_PY", "_PZ", "_E"],
+    )
+    assert booked_true[("m", ("pi1", "pi2"))] == "expr_pi1_pi2_M_PX_PY_PZ_E"
+    results_true = rdf_true.AsNumpy(list(booked_true.values()))
+    assert np.allclose(
+        results_true["expr_pi1_pi2_M_PX_PY_PZ_E"],
+        get_invariant_mass_function(["pi1", "pi2"], suffix_PxPyPzE="PXPYPZE")(columns),
+        equal_nan=True,
+    )
+
+    # two suffixes can be booked on the same node
+    components = ["_PX", "_PY", "_PZ", "_PE"]
+    columns_suffixes = _random_columns(
+        prefixes,
+        [component + suffix for suffix in ["_1", "_2"] for component in components],
+    )
+    rdf_suffixes = ROOT.RDF.FromNumpy(columns_suffixes)
+    booked_suffixes = {}
+    for suffix in ["_1", "_2"]:
+        rdf_suffixes, booked_suffixes[suffix] = book_kinematics(
+            rdf_suffixes,
+            prefixes,
+            invariant_masses=2,
+            clone_rejection=0.5,
+            suffix=suffix,
+        )
+    assert booked_suffixes["_2"]["clone_rejection"] == (
+        "expr_pi1_pi2_pi3_clone_rejection_2"
+    )
+    results_suffixes = rdf_suffixes.AsNumpy(
+        [name for booked in booked_suffixes.values() for name in booked.values()]
+    )
+    for suffix in ["_1", "_2"]:
+        name = booked_suffixes[suffix][("m", ("pi1", "pi2"))]
+        assert np.allclose(
+            results_suffixes[name],
+            get_invariant_mass_function(["pi1", "pi2"], suffix=suffix)(
+                columns_suffixes
+            ),
+            equal_nan=True,
+        )
+
+    for prefix in prefixes:
+        assert np.allclose(results[f"expr_{prefix}_P"], get_p_function(prefix)(columns))
+    for combination in [["pi1", "pi2"], ["pi1", "pi3"], ["pi2", "pi3"]]:
+        assert np.allclose(
+            results[f"expr_{'_'.join(combination)}_M"],
+            get_invariant_mass_function(combination)(columns),
+            equal_nan=True,
+        )
+    assert (
+        results["expr_pi1_pi2_pi3_clone_rejection"]
+        == get_clone_rejection_function(prefixes, 0.5)(columns)
+    ).all()
+
+    columns_hypothesis = dict(columns)
+    columns_hypothesis["pi1_PE"] = get_pe_function(
+        "pi1", mass_hypothesis=493.677, suffix_PxPyPzM=["_PX", "_PY", "_PZ", ""]
+    )(columns)
+    assert np.allclose(
+        results_hypothesis["expr_pi1_PE_493_677"], columns_hypothesis["pi1_PE"]
+    )
+    assert np.allclose(
+        results_hypothesis["expr_pi1_pi2_pi3_M"],
+        get_invariant_mass_function(prefixes)(columns_hypothesis),
+        equal_nan=True,
+    )
@@ -0,0 +1,134 @@
+# SPDX-FileCopyrightText: 2024-present Anfeng Li <anfeng.li@cern.ch>
+#
+# SPDX-License-Identifier: MIT
+
+import numpy as np
+import pytest
+
+from src.data_analysis_helper.hist import HistogramCache, histogram
+
+
+def test_histogram():
+    np.random.seed(42)
+    data = np.random.normal(0, 1, 10000)
+    weights = np.random.uniform(0.5, 1.5, 10000)
+
+    for bins, range in [(50, None), (50, (-2, 2)), (np.linspace(-3, 1, 7), None)]:
+        expected, edges = np.histogram(data, bins, range=range, weights=weights)
+        expected_sq, _ = np.histogram(data, bins, range=range, weights=weights**2)
+        sumw, sumw2, bin_edges = histogram(
+            data, bins, range=range, weights=weights, chunk_size=999
+        )
+        assert (bin_edges == edges).all()
+        assert np.allclose(sumw, expected)
+        assert np.allclose(sumw2, expected_sq)
+
+        expected, _ = np.histogram(data, bins, range=range)
+        sumw, sumw2, _ = histogram(data, bins, range=range)
+        assert (sumw == expected).all()
+        assert (sumw2 == expected).all()
+
+    # values on the bin edges, for the arithmetic and the binary search lookup
+    on_edges = np.linspace(-2, 2, 401)
+    for bins in [40, np.linspace(-2, 2, 41), np.append(np.linspace(-2, 1, 31), 2)]:
+        expected, _ = np.histogram(on_edges, bins, range=(-2, 2))
+        sumw, _, _ = histogram(on_edges, bins, range=(-2, 2))
+        assert (sumw == expected).all()
+
+    # binning rules are evaluated on the data within range
+    for bins, range in [("auto", None), ("auto", (-2, 2)), ("sturges", (-1, 3))]:
+        expected, edges = np.histogram(data, bins, range=range)
+        sumw, _, bin_edges = histogram(data, bins, range=range)
+        assert (bin_edges == edges).all()
+        assert (sumw == expected).all()
+
+
+def test_histogram_chunks(tmp_path):
+    np.random.seed(42)
+    data = np.random.normal(0, 1, 10000)
+    weights = np.random.uniform(0.5, 1.5, 10000)
+    expected, edges = np.histogram(data, 40, range=(-3, 3), weights=weights)
+
+    chunks = (
+        (data[i : i + 1000], weights[i : i + 1000]) for i in range(0, 10000, 1000)
+    )
+    sumw, _, bin_edges = histogram(chunks, 40, range=(-3, 3))
+    assert (bin_edges == edges).all()
+    assert np.allclose(sumw, expected)
+
+    # a list of chunks is also a stream, a list of numbers is data
+    chunks = [
+        (data[i : i + 1000], weights[i : i + 1000]) for i in range(0, 10000, 1000)
+    ]
+    sumw, _, _ = histogram(chunks, 40, range=(-3, 3))
+    assert np.allclose(sumw, expected)
+    chunks = [data[i : i + 1000] for i in range(0, 10000, 1000)]
+    sumw, _, _ = histogram(chunks, 40, range=(-3, 3))
+    assert (sumw == np.histogram(data, 40, range=(-3, 3))[0]).all()
+    sumw, _, _ = histogram(data.tolist(), 40, range=(-3, 3))
+    assert (sumw == np.histogram(data, 40, range=(-3, 3))[0]).all()
+
+    path = tmp_path / "data.npy"
+    np.save(path, data)
+    memmap = np.load(path, mmap_mode="r")
+    sumw, _, _ = histogram(memmap, 40, range=(-3, 3), weights=weights, chunk_size=300)
+    assert np.allclose(sumw, expected)
+
+    with pytest.raises(ValueError):
+        histogram(iter([data]), 40)
+    with pytest.raises(ValueError):
+        histogram(iter([data]), "auto", range=(-3, 3))
+
+
+def test_histogram_cache(tmp_path):
+    np.random.seed(42)
+    data = np.random.normal(0, 1, 1000000)
+    weights = np.random.uniform(0.5, 1.5, 1000000)
+
+    cache = HistogramCache()
+    expected = histogram(data, 50, weights=weights)
+    for _ in range(3):
+        result = cache.histogram(data, 50, weights=weights)
+        for array, expected_array in zip(result, expected):
+            assert (array == expected_array).all()
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    # different binning, weights or data are different entries
+    cache.histogram(data, 50, range=(-1, 1), weights=weights)
+    cache.histogram(data, 50)
+    data_modified = data.copy()
+    data_modified[-1] = 100
+    sumw, _, bin_edges = cache.histogram(data_modified, 50)
+    assert bin_edges[-1] == 100
+    assert (cache.hits, cache.misses) == (2, 4)
+
+    # LRU eviction within the memory budget
+    small_cache = HistogramCache(max_bytes=2 * 3 * 8 * 11)
+    for bins in [10, 10, 20, 10]:
+        small_cache.histogram(data[:1000], bins)
+    assert (small_cache.hits, small_cache.misses) == (1, 3)
+
+    # on-disk tier is shared between cache instances
+    HistogramCache(directory=tmp_path).histogram(data, 50, weights=weights)
+    disk_cache = HistogramCache(directory=tmp_path)
+    sumw, _, _ = disk_cache.histogram(data, 50, weights=weights)
+    assert (disk_cache.hits, disk_cache.misses) == (1, 0)
+    assert (sumw == expected[0]).all()
+
+    # regenerated data with the same fingerprint is not served from disk
+    data_regenerated = data.copy()
+    data_regenerated[len(data) // 2 + 1] = 100
+    other_cache = HistogramCache(directory=tmp_path)
+    _, _, bin_edges = other_cache.histogram(data_regenerated, 50, weights=weights)
+    assert bin_edges[-1] == 100
+    assert (other_cache.hits, other_cache.misses) == (0, 1)
+
+    # in-place modifications are not noticed until the cache is cleared
+    data[len(data) // 2 + 1] = 100
+    disk_cache.histogram(data, 50, weights=weights)
+    assert disk_cache.hits == 2
+    disk_cache.clear()
+    assert list(tmp_path.glob("*.npz")) == []
+    _, _, bin_edges = disk_cache.histogram(data, 50, weights=weights)
+    assert bin_edges[-1] == 100
+    assert disk_cache.misses == 1
@@ -18,3 +18,28 @@ def test_histplot():
     histplot(data1, bins=50, xlabel="test")
     histplot(data1, bins=50, xlabel="test", weights=weights1)
     histplot(data2, bins=100, xlabel="test", unit="MeV", weights=weights2)
+
+
+def test_histplot_chunks():
+    np.random.seed(42)
+    data = np.random.normal(0, 1, 10000)
+    weights = np.random.uniform(0.5, 1.5, 10000)
+
+    chunks = (
+        (data[i : i + 1000], weights[i : i + 1000]) for i in range(0, 10000, 1000)
+    )
+    histplot(chunks, bins=50, range=(-3, 3), xlabel="test", unit="MeV")
+
+
+def test_histplot_cache():
+    from src.data_analysis_helper.hist import HistogramCache
+
+    np.random.seed(42)
+    data = np.random.normal(0, 1, 10000)
+    weights = np.random.uniform(0.5, 1.5, 10000)
+
+    cache = HistogramCache()
+    histplot(data, bins=50, xlabel="test", weights=weights, cache=cache)
+    histplot(data, bins=50, xlabel="test", unit="MeV", weights=weights, cache=cache)
+    histplot(data, bins=50, xlabel="test", cache=True)
+    assert (cache.hits, cache.misses) == (1, 1)
@@ -3,6 +3,7 @@
 # SPDX-License-Identifier: MIT
 
 import numpy as np
+import pytest
 from scipy.stats import ks_2samp
 
 from src.data_analysis_helper.stats import kstest
@@ -38,3 +39,185 @@ def test_kstest():
     print(f"KS统计量: {result_std.statistic}")
     print(f"P值: {result_std.pvalue}")
     assert round(ks_stat, 2) == round(result_std.statistic, 2)
+
+
+def test_kstest_statistic_matches_scipy():
+    np.random.seed(0)
+    data1 = np.random.normal(0, 1, 300)
+    data2 = np.random.normal(0.2, 1.2, 200)
+    # 含并列值的离散数据
+    data3 = np.random.poisson(3, 300)
+    data4 = np.random.poisson(3.5, 200)
+
+    for a, b in [(data1, data2), (data3, data4)]:
+        ks_stat, p_value = kstest(a, b, n_permutations=200)
+        assert np.isclose(ks_stat, ks_2samp(a, b).statistic)
+        assert 0 < p_value <= 1
+
+    # 整数权重等价于重复事例
+    weights3 = np.random.randint(1, 4, 300)
+    ks_stat_weighted, _ = kstest(data1, data2, weights3, None, n_permutations=10)
+    assert np.isclose(
+        ks_stat_weighted, ks_2samp(np.repeat(data1, weights3), data2).statistic
+    )
+
+
+def test_kstest_memory_limit():
+    np.random.seed(1)
+    data1 = np.random.normal(0, 1, 100)
+    data2 = np.random.normal(0.3, 1, 150)
+
+    np.random.seed(2)
+    result = kstest(data1, data2, n_permutations=100)
+    np.random.seed(2)
+    result_small_batches = kstest(data1, data2, n_permutations=100, memory_limit=1)
+    assert result == result_small_batches
+
+
+def test_kstest_seed():
+    np.random.seed(1)
+    data1 = np.random.normal(0, 1, 100)
+    data2 = np.random.normal(0.2, 1, 150)
+
+    result = kstest(data1, data2, n_permutations=450, seed=7)
+    # 结果与线程数、分批大小无关
+    assert kstest(data1, data2, n_permutations=450, seed=7, n_jobs=4) == result
+    assert kstest(data1, data2, n_permutations=450, seed=7, memory_limit=1) == result
+    assert (
+        kstest(data1, data2, n_permutations=450, seed=np.random.SeedSequence(7))
+        == result
+    )
+    assert kstest(
+        data1, data2, n_permutations=450, seed=np.random.default_rng(3)
+    ) == kstest(data1, data2, n_permutations=450, seed=np.random.default_rng(3))
+    # 序贯方法的检查点与分块对齐
+    assert kstest(
+        data1, data2, n_permutations=450, method="sequential", seed=7, n_jobs=3
+    ) == kstest(data1, data2, n_permutations=450, method="sequential", seed=7)
+
+
+def test_kstest_methods():
+    np.random.seed(3)
+    data1 = np.random.normal(0, 1, 1000)
+    data2 = np.random.normal(0.3, 1, 1500)
+    data3 = np.random.normal(0, 1, 1500)
+    weights1 = np.random.uniform(0.5, 1.5, 1000)
+    weights3 = np.random.uniform(0.5, 1.5, 1500)
+
+    # 无权重时渐近p值与scipy一致
+    ks_stat, p_value = kstest(data1, data3, method="asymptotic")
+    result_std = ks_2samp(data1, data3, method="asymp")
+    assert np.isclose(ks_stat, result_std.statistic)
+    assert np.isclose(p_value, result_std.pvalue, rtol=0.1)
+
+    # 带权重时与置换检验给出相同的结论
+    for a, b, w_a, w_b, significant in [
+        (data1, data2, weights1, None, True),
+        (data1, data3, weights1, weights3, False),
+    ]:
+        for method in ["exact-permutation", "asymptotic", "sequential"]:
+            _, p_value = kstest(a, b, w_a, w_b, n_permutations=2000, method=method)
+            assert (p_value < 0.05) == significant
+
+
+def test_kstest_batch():
+    from src.data_analysis_helper.stats import kstest_batch
+
+    rng = np.random.default_rng(0)
+    data1 = rng.normal(0, 1, (300, 5))
+    data2 = rng.normal(0, 1, (400, 5))
+    data2[:, 0] += 0.5
+    data2[:, 3] = np.round(data2[:, 3])  # ties
+    data1[:, 3] = np.round(data1[:, 3])
+    weights1 = rng.uniform(0.5, 1.5, 300)
+    weights2 = rng.uniform(0.5, 1.5, 400)
+
+    ks_statistics, p_values, maxt_p_values = kstest_batch(
+        data1, data2, weights1, weights2, 250, maxt=True, seed=1, n_jobs=2
+    )
+    assert ks_statistics.shape == p_values.shape == maxt_p_values.shape == (5,)
+    # the same as separate calls with the same permutations
+    for i in range(5):
+        ks_statistic, p_value = kstest(
+            data1[:, i], data2[:, i], weights1, weights2, 250, seed=1
+        )
+        assert np.isclose(ks_statistics[i], ks_statistic)
+        assert p_values[i] == p_value
+    assert (maxt_p_values >= p_values).all()
+    assert maxt_p_values[0] < 0.05
+    assert (maxt_p_values[1:] > 0.05).all()
+
+
+def test_kstest_binned():
+    from src.data_analysis_helper.stats import kstest_binned
+
+    rng = np.random.default_rng(0)
+    data1 = rng.normal(0, 1, 20000)
+    data2 = rng.normal(0.05, 1, 30000)
+    weights1 = rng.uniform(0.5, 1.5, 20000)
+
+    ks_stat, p_value = kstest(data1, data2, weights1, method="asymptotic")
+    ks_stat_binned, p_value_binned, error = kstest_binned(
+        data1, data2, weights1, bins=1000
+    )
+    assert ks_stat_binned <= ks_stat <= ks_stat_binned + error
+    assert error < 0.01
+    assert np.isclose(p_value_binned, p_value, rtol=0.5)
+
+    # 逐块输入，范围外的事例计入溢出bin
+    def iterate(data, weights, chunk_size):
+        for start in range(0, len(data), chunk_size):
+            yield data[start : start + chunk_size], weights[start : start + chunk_size]
+
+    ks_stat_streamed, _, error_streamed = kstest_binned(
+        iterate(data1, weights1, 3000),
+        (data2[start : start + 7000] for start in range(0, len(data2), 7000)),
+        bins=1000,
+        range=(-2, 2),
+    )
+    assert ks_stat_streamed <= ks_stat <= ks_stat_streamed + error_streamed
+    with pytest.raises(ValueError):
+        kstest_binned(iter([data1]), iter([data2]))
+
+
+def test_two_sample_test():
+    from scipy.stats import chi2_contingency, cramervonmises_2samp
+
+    from src.data_analysis_helper.stats import two_sample_test
+
+    rng = np.random.default_rng(0)
+    data1 = rng.normal(0, 1, 300)
+    data2 = rng.normal(0.3, 1, 400)
+
+    statistic_values, p_values = two_sample_test(
+        data1, data2, n_permutations=300, seed=5, n_jobs=2
+    )
+    assert list(p_values) == ["ks", "cvm", "ad", "chi2"]
+    assert all(p_value < 0.05 for p_value in p_values.values())
+    # 与单独计算的结果一致
+    assert (statistic_values["ks"], p_values["ks"]) == kstest(
+        data1, data2, n_permutations=300, seed=5
+    )
+    assert np.isclose(
+        statistic_values["cvm"], cramervonmises_2samp(data1, data2).statistic
+    )
+    statistic_values_chi2, p_values_chi2 = two_sample_test(
+        data1, data2, n_permutations=300, statistics=["chi2"], bins=5, seed=5
+    )
+    edges = np.quantile(np.concatenate([data1, data2]), np.linspace(0, 1, 6))
+    table = [np.histogram(data1, edges)[0], np.histogram(data2, edges)[0]]
+    assert np.isclose(
+        statistic_values_chi2["chi2"], chi2_contingency(table).statistic, rtol=0.05
+    )
+
+    # 带权重、同分布
+    weights1 = rng.uniform(0.5, 1.5, 300)
+    data3 = rng.normal(0, 1, 400)
+    _, p_values = two_sample_test(
+        data1, data3, weights1, n_permutations=300, statistics=["cvm", "ad"], seed=5
+    )
+    assert list(p_values) == ["cvm", "ad"]
+    assert all(p_value > 0.05 for p_value in p_values.values())
+
+    with pytest.raises(ValueError):
+        two_sample_test(data1, data2, statistics=["t"])
@@ -0,0 +1,61 @@
+# SPDX-FileCopyrightText: 2024-present Anfeng Li <anfeng.li@cern.ch>
+#
+# SPDX-License-Identifier: MIT
+
+import logging
+import pickle
+
+from src.data_analysis_helper import OutputSink, print_func
+
+
+def test_print_func(capfd):
+    print_func('string with "quotes" and $(echo shell)')
+    print_func("no newline", end=None)
+    print_func()
+    out, _ = capfd.readouterr()
+    assert out == 'string with "quotes" and $(echo shell)\nno newline\n'
+
+
+def test_output_sink_file(tmp_path):
+    path = tmp_path / "log.txt"
+    sink = OutputSink(path, level=logging.INFO, buffer_size=1000)
+    sink("line 1")
+    sink("debug line", level=logging.DEBUG)
+    sink("line 2", level=logging.WARNING)
+    assert path.read_text() == ""
+    sink.flush()
+    assert path.read_text() == "line 1\nline 2\n"
+    sink.close()
+
+
+def test_output_sink_asynchronous(tmp_path):
+    path = tmp_path / "log.txt"
+    sink = OutputSink(path, buffer_size=0, asynchronous=True)
+    for i in range(1000):
+        sink(f"line {i}")
+    sink.close()
+    assert path.read_text() == "".join(f"line {i}\n" for i in range(1000))
+
+
+def test_output_sink_logger(caplog):
+    logger = logging.getLogger("test_output_sink")
+    sink = OutputSink(logger, level=logging.DEBUG)
+    with caplog.at_level(logging.DEBUG, logger="test_output_sink"):
+        sink("info message")
+        sink("debug message", level=logging.DEBUG)
+        sink.flush()
+    assert [(record.levelno, record.message) for record in caplog.records] == [
+        (logging.INFO, "info message"),
+        (logging.DEBUG, "debug message"),
+    ]
+
+
+def test_output_sink_pickle(tmp_path):
+    path = tmp_path / "log.txt"
+    sink = OutputSink(path, level=logging.WARNING)
+    sink_copy = pickle.loads(pickle.dumps(sink))
+    assert sink_copy.level == logging.WARNING
+    sink_copy("from copy", level=logging.ERROR)
+    sink_copy.close()
+    sink.close()
+    assert path.read_text() == "from copy\n"
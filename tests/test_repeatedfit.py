@@ -3,6 +3,7 @@
 # SPDX-License-Identifier: MIT
 
 import numpy as np
+import pytest
 import ROOT
 
 from src.data_analysis_helper.root import RepeatedFit
@@ -62,6 +63,25 @@ def test_repeatedfit_explicit_paramlist():
     assert round(result_best.floatParsFinal().find("sigma").getVal(), 1) == 1.0
 
 
+def test_repeatedfit_zero_fits():
+    x = ROOT.RooRealVar("x", "x", -5, 5)
+    mean = ROOT.RooRealVar("mean", "mean", 0, -3, 3)
+    sigma = ROOT.RooRealVar("sigma", "sigma", 1, 0.5, 3)
+    pdf = ROOT.RooGaussian("gauss", "gauss", x, mean, sigma)
+
+    data = pdf.generate(x, 100)
+    for start_points in ["uniform", "sobol"]:
+        repeated_fit = RepeatedFit(
+            model=pdf, data=data, num_fits=0, start_points=start_points
+        )
+        repeated_fit.do_repeated_fit()
+        assert len(repeated_fit.fitresults) == 0
+        assert repeated_fit.get_best_result() is None
+
+        repeated_fit.do_staged_fit()
+        assert repeated_fit.get_best_result() is None
+
+
 def test_repeatedfit_manyparams():
     x = ROOT.RooRealVar("x", "x", -5, 5)
     means = [ROOT.RooRealVar(f"mean{i}", f"mean{i}", 0, -1, 1) for i in range(100)]
@@ -182,3 +202,505 @@ def test_repeatedfit_use_initial_values():
     for i in range(10):
         assert repeated_fit.fitresults[i].floatParsInit().find("mean").getVal() != 0
         assert repeated_fit.fitresults[i].floatParsInit().find("sigma").getVal() != 1
+
+
+def test_repeatedfit_parallel():
+    x = ROOT.RooRealVar("x", "x", -5, 5)
+    mean = ROOT.RooRealVar("mean", "mean", 0, -3, 3)
+    sigma = ROOT.RooRealVar("sigma", "sigma", 1, 0.5, 3)
+    pdf = ROOT.RooGaussian("gauss", "gauss", x, mean, sigma)
+
+    data = pdf.generate(x, 10000)
+
+    results = []
+    for n_workers in [2, 3]:
+        mean.setVal(0)
+        sigma.setVal(1)
+        repeated_fit = RepeatedFit(model=pdf, data=data, num_fits=6, random_seed=1)
+        repeated_fit.do_repeated_fit(n_workers=n_workers)
+
+        repeated_fit.print_all_results()
+        repeated_fit.print_succeeded_results()
+        repeated_fit.print_best_result()
+        result_best = repeated_fit.get_best_result()
+
+        assert len(repeated_fit.fitresults) == 6
+        assert len(repeated_fit.get_succeeded_results()) == 6
+        assert result_best is not None
+        assert round(result_best.floatParsFinal().find("mean").getVal(), 1) == 0.0
+        assert round(result_best.floatParsFinal().find("sigma").getVal(), 1) == 1.0
+        assert repeated_fit.fitresults[0].floatParsInit().find("mean").getVal() == 0
+        results.append(
+            [
+                (fitresult.minNll(), fitresult.floatParsFinal().find("mean").getVal())
+                for fitresult in repeated_fit.fitresults
+            ]
+        )
+
+    assert results[0] == results[1]
+
+    # print_func is not sent to the workers, so it need not be picklable
+    fit_indices = []
+    repeated_fit = RepeatedFit(
+        model=pdf,
+        data=data,
+        num_fits=6,
+        random_seed=1,
+        print_func=lambda string="", end="\n": fit_indices.extend(
+            [int(string.split()[-2])] if "begin of fit" in string else []
+        ),
+    )
+    repeated_fit.do_repeated_fit(n_workers=2)
+    assert fit_indices == list(range(6))
+
+
+def test_repeatedfit_checkpoint(tmp_path):
+    import os
+
+    from src.data_analysis_helper.root import load_fit_checkpoint
+
+    x = ROOT.RooRealVar("x", "x", -5, 5)
+    mean = ROOT.RooRealVar("mean", "mean", 0, -3, 3)
+    sigma = ROOT.RooRealVar("sigma", "sigma", 1, 0.5, 3)
+    pdf = ROOT.RooGaussian("gauss", "gauss", x, mean, sigma)
+
+    data = pdf.generate(x, 1000)
+    checkpoint = tmp_path / "checkpoint"
+
+    repeated_fit = RepeatedFit(model=pdf, data=data, num_fits=6, random_seed=1)
+    repeated_fit.do_repeated_fit(checkpoint=checkpoint, checkpoint_covariance=True)
+    records, parameter_names = load_fit_checkpoint(checkpoint)
+    assert parameter_names == ["mean", "sigma"]
+    assert (records["index"] == np.arange(6)).all()
+    for record, fitresult in zip(records, repeated_fit.fitresults):
+        assert record["status"] == fitresult.status()
+        assert record["min_nll"] == fitresult.minNll()
+        assert record["values"][0] == fitresult.floatParsFinal().find("mean").getVal()
+        assert (
+            record["errors"][1] == fitresult.floatParsFinal().find("sigma").getError()
+        )
+        assert np.isclose(
+            record["covariance"][0, 0], record["errors"][0] ** 2, rtol=1e-3
+        )
+
+    # simulate a job killed in the middle of writing the fifth fit
+    record_size = os.path.getsize(checkpoint / "results.bin") // 6
+    os.truncate(checkpoint / "results.bin", 4 * record_size + record_size // 2)
+
+    fit_indices = []
+    repeated_fit_resumed = RepeatedFit(
+        model=pdf,
+        data=data,
+        num_fits=6,
+        random_seed=2,  # start points come from the checkpoint, not the RNG
+        print_func=lambda string="", end="\n": fit_indices.extend(
+            [int(string.split()[-2])] if "begin of fit" in string else []
+        ),
+    )
+    repeated_fit_resumed.do_repeated_fit(checkpoint=checkpoint)
+    assert fit_indices == [4, 5]
+    assert len(load_fit_checkpoint(checkpoint)[0]) == 6
+    for fitresult, fitresult_resumed in zip(
+        repeated_fit.fitresults, repeated_fit_resumed.fitresults
+    ):
+        assert (
+            fitresult.floatParsInit().find("mean").getVal()
+            == fitresult_resumed.floatParsInit().find("mean").getVal()
+        )
+        assert np.isclose(fitresult.minNll(), fitresult_resumed.minNll())
+    assert repeated_fit_resumed.get_best_result() is not None
+
+    # only the RooFitResults retained by keep_fitresults are stored
+    import pickle
+    import struct
+
+    checkpoint = tmp_path / "checkpoint_keep"
+    repeated_fit = RepeatedFit(model=pdf, data=data, num_fits=6, random_seed=1)
+    repeated_fit.do_repeated_fit(checkpoint=checkpoint, keep_fitresults=2)
+    stored = []
+    with open(checkpoint / "fitresults.pkl", "rb") as file:
+        while header := file.read(8):
+            stored.append(pickle.loads(file.read(struct.unpack("<Q", header)[0]))[0])
+    assert 2 <= len(stored) < 6
+    record_size = os.path.getsize(checkpoint / "results.bin") // 6
+    os.truncate(checkpoint / "results.bin", 4 * record_size)
+    fit_indices = []
+    repeated_fit_resumed = RepeatedFit(
+        model=pdf,
+        data=data,
+        num_fits=6,
+        print_func=lambda string="", end="\n": fit_indices.extend(
+            [int(string.split()[-2])] if "begin of fit" in string else []
+        ),
+    )
+    repeated_fit_resumed.do_repeated_fit(checkpoint=checkpoint, keep_fitresults=2)
+    assert fit_indices == [4, 5]
+    # the results table is rebuilt from the records, the last fits are rerun
+    for field in ["status", "min_nll", "values", "errors"]:
+        np.testing.assert_array_equal(
+            repeated_fit_resumed.results[field][:4], repeated_fit.results[field][:4]
+        )
+    np.testing.assert_allclose(
+        repeated_fit_resumed.results["min_nll"], repeated_fit.results["min_nll"]
+    )
+    assert len(repeated_fit_resumed.get_succeeded_results()) == 2
+    assert np.isclose(
+        repeated_fit_resumed.get_best_result().minNll(),
+        repeated_fit.get_best_result().minNll(),
+    )
+
+    # a partially written last entry is dropped, the complete entries are kept
+    fitresults_path = checkpoint / "fitresults.pkl"
+    size = os.path.getsize(fitresults_path)
+    with open(fitresults_path, "ab") as file:
+        file.write(struct.pack("<Q", 1000) + b"partial")
+    RepeatedFit(model=pdf, data=data, num_fits=6).do_repeated_fit(
+        checkpoint=checkpoint, keep_fitresults=2
+    )
+    assert os.path.getsize(fitresults_path) == size
+
+    # an entry which cannot be loaded is an error, and nothing is truncated
+    unloadable = b"\x80\x04cno_such_module\nThing\n."
+    with open(fitresults_path, "rb") as file:
+        entries = file.read()
+    with open(fitresults_path, "wb") as file:
+        file.write(struct.pack("<Q", len(unloadable)) + unloadable + entries)
+    size = os.path.getsize(fitresults_path)
+    with pytest.raises(ModuleNotFoundError):
+        RepeatedFit(model=pdf, data=data, num_fits=6).do_repeated_fit(
+            checkpoint=checkpoint
+        )
+    assert os.path.getsize(fitresults_path) == size
+
+
+def test_repeatedfit_results_table():
+    x = ROOT.RooRealVar("x", "x", -5, 5)
+    mean = ROOT.RooRealVar("mean", "mean", 0, -3, 3)
+    sigma = ROOT.RooRealVar("sigma", "sigma", 1, 0.5, 3)
+    pdf = ROOT.RooGaussian("gauss", "gauss", x, mean, sigma)
+
+    data = pdf.generate(x, 1000)
+    repeated_fit = RepeatedFit(model=pdf, data=data, num_fits=10, random_seed=3)
+    repeated_fit.do_repeated_fit(keep_fitresults=2)
+
+    results = repeated_fit.results
+    assert repeated_fit.result_parameter_names == ["mean", "sigma"]
+    assert (results["index"] == np.arange(10)).all()
+    assert len([fitresult for fitresult in repeated_fit.fitresults if fitresult]) == 2
+    assert len(repeated_fit.get_succeeded_results()) == 2
+
+    result_best = repeated_fit.get_best_result()
+    assert result_best is not None
+    assert result_best.minNll() == results["min_nll"][results["status"] == 0].min()
+    best_index = repeated_fit.fitresults.index(result_best)
+    assert (
+        results["values"][best_index][0]
+        == result_best.floatParsFinal().find("mean").getVal()
+    )
+
+    repeated_fit.print_all_results()
+    repeated_fit.print_succeeded_results()
+    repeated_fit.print_best_result()
+
+    # the missing RooFitResults are rejected rather than failing on None
+    from src.data_analysis_helper.root import convert_fit_result_matrices
+
+    with pytest.raises(ValueError, match="None"):
+        convert_fit_result_matrices(repeated_fit.fitresults)
+    assert convert_fit_result_matrices(repeated_fit.get_succeeded_results()).shape == (
+        2,
+        2,
+        2,
+    )
+
+    # retention ranks with keep_statuses: when the best fit has status 1, it is
+    # only retained if status 1 is allowed
+    repeated_fit.do_repeated_fit()
+    records = repeated_fit.results.copy()
+    fitresults = list(repeated_fit.fitresults)
+    best_index = int(np.argmin(records["min_nll"]))
+    records["status"][best_index] = 1
+    for keep_statuses in [[0], [0, 1]]:
+        repeated_fit._keep_fitresults = 1
+        repeated_fit._keep_statuses = keep_statuses
+        repeated_fit._retained_heap = []
+        for record, fitresult in zip(records, fitresults):
+            repeated_fit._add_record(record, fitresult)
+        if keep_statuses == [0]:
+            assert repeated_fit.get_best_result() is not None
+            with pytest.raises(ValueError, match="not retained"):
+                repeated_fit.get_best_result(allowed_statuses=[0, 1])
+        else:
+            with pytest.raises(ValueError, match="not retained"):
+                repeated_fit.get_best_result()
+            assert (
+                repeated_fit.get_best_result(allowed_statuses=[0, 1])
+                is fitresults[best_index]
+            )
+
+
+def test_repeatedfit_start_points():
+    x = ROOT.RooRealVar("x", "x", -5, 5)
+    mean = ROOT.RooRealVar("mean", "mean", 0, -3, 3)
+    sigma = ROOT.RooRealVar("sigma", "sigma", 1, 0.5, 3)
+    sigma.setError(0.2)
+    pdf = ROOT.RooGaussian("gauss", "gauss", x, mean, sigma)
+    data = pdf.generate(x, 1000)
+
+    for strategy in ["uniform", "latin-hypercube", "sobol", "halton", "gaussian"]:
+        repeated_fit = RepeatedFit(
+            model=pdf, data=data, num_fits=16, random_seed=1, start_points=strategy
+        )
+        start_points = repeated_fit.start_points
+        assert repeated_fit.start_point_names == ["mean", "sigma"]
+        assert start_points.shape == (16, 2)
+        assert (start_points >= [-3, 0.5]).all() and (start_points <= [3, 3]).all()
+        assert_rds_column_no_duplication(repeated_fit.parameter_samples)
+
+        # reproducible with the same seed
+        repeated_fit_again = RepeatedFit(
+            model=pdf, data=data, num_fits=16, random_seed=1, start_points=strategy
+        )
+        np.testing.assert_array_equal(start_points, repeated_fit_again.start_points)
+
+    # latin hypercube: exactly one point in each of the num_fits strata per parameter
+    repeated_fit = RepeatedFit(
+        model=pdf, data=data, num_fits=16, random_seed=1, start_points="latin-hypercube"
+    )
+    unit = (repeated_fit.start_points - [-3, 0.5]) / [6, 2.5]
+    for column in unit.T:
+        assert sorted(np.floor(column * 16).astype(int)) == list(range(16))
+
+    # user-supplied samples are kept as given
+    samples = repeated_fit.parameter_samples
+    repeated_fit = RepeatedFit(
+        model=pdf, data=data, num_fits=16, parameter_samples=samples
+    )
+    assert repeated_fit.parameter_samples is samples
+    repeated_fit.do_repeated_fit()
+    assert len(repeated_fit.get_succeeded_results()) > 0
+
+    # only the first num_fits of more samples are fitted
+    repeated_fit = RepeatedFit(
+        model=pdf, data=data, num_fits=5, parameter_samples=samples
+    )
+    assert repeated_fit.start_points.shape == (5, 2)
+    repeated_fit.do_repeated_fit()
+    assert len(repeated_fit.fitresults) == 5
+    repeated_fit.do_staged_fit(promote=2)
+    assert len(repeated_fit.coarse_results) == 5
+
+
+def test_repeatedfit_stopping():
+    from src.data_analysis_helper.root import StoppingPolicy
+
+    x = ROOT.RooRealVar("x", "x", -5, 5)
+    mean = ROOT.RooRealVar("mean", "mean", 0, -3, 3)
+    sigma = ROOT.RooRealVar("sigma", "sigma", 1, 0.5, 3)
+    pdf = ROOT.RooGaussian("gauss", "gauss", x, mean, sigma)
+    data = pdf.generate(x, 1000)
+
+    # a single minimum: reproduced by the first fits
+    repeated_fit = RepeatedFit(model=pdf, data=data, num_fits=20, random_seed=0)
+    repeated_fit.do_repeated_fit(stopping=StoppingPolicy(reproduce=3))
+    num_done = np.count_nonzero(repeated_fit.results["index"] >= 0)
+    assert repeated_fit.stop_reason.startswith("best NLL reproduced")
+    assert num_done == 3
+    assert repeated_fit.get_best_result() is not None
+
+    repeated_fit.do_repeated_fit(
+        stopping=StoppingPolicy(unseen_probability=0.2, min_fits=5)
+    )
+    assert "unseen" in repeated_fit.stop_reason
+    assert np.count_nonzero(repeated_fit.results["index"] >= 0) == 5
+
+    repeated_fit.do_repeated_fit(stopping=StoppingPolicy(max_cpu_time=0))
+    assert "CPU time" in repeated_fit.stop_reason
+    assert np.count_nonzero(repeated_fit.results["index"] >= 0) == 0
+
+    # parallel: pending fits are cancelled
+    repeated_fit.do_repeated_fit(n_workers=2, stopping=StoppingPolicy(reproduce=2))
+    num_done = np.count_nonzero(repeated_fit.results["index"] >= 0)
+    assert repeated_fit.stop_reason is not None
+    assert 2 <= num_done < 20
+
+    repeated_fit.do_repeated_fit(stopping=StoppingPolicy())
+    assert repeated_fit.stop_reason is None
+    assert np.count_nonzero(repeated_fit.results["index"] >= 0) == 20
+
+
+def test_repeatedfit_reuse_nll():
+    import pytest
+
+    x = ROOT.RooRealVar("x", "x", -5, 5)
+    mean = ROOT.RooRealVar("mean", "mean", 0, -3, 3)
+    sigma = ROOT.RooRealVar("sigma", "sigma", 1, 0.5, 3)
+    pdf = ROOT.RooGaussian("gauss", "gauss", x, mean, sigma)
+    data = pdf.generate(x, 1000)
+    parameters = pdf.getParameters(data)
+    initial_parameters = parameters.snapshot()
+
+    all_results = []
+    for options in [
+        dict(),
+        dict(reuse_nll=True),
+        dict(reuse_nll=True, n_workers=2),
+    ]:
+        parameters.assign(initial_parameters)
+        repeated_fit = RepeatedFit(model=pdf, data=data, num_fits=6, random_seed=0)
+        repeated_fit.do_repeated_fit(Minos=True, PrintLevel=-1, **options)
+        assert len(repeated_fit.get_succeeded_results()) == 6
+        all_results.append(repeated_fit.results)
+
+    # the same fit results as with fitTo
+    results, results_reuse, results_parallel = all_results
+    for field in ["status", "cov_qual", "min_nll", "values", "errors", "errors_lo"]:
+        np.testing.assert_array_equal(results_reuse[field], results[field])
+    # parallel fits do not carry over the previous fit, so only the minima agree
+    np.testing.assert_allclose(
+        results_parallel["min_nll"], results["min_nll"], rtol=0, atol=1e-3
+    )
+
+    with pytest.raises(ValueError, match="SumW2Error"):
+        repeated_fit.do_repeated_fit(reuse_nll=True, SumW2Error=True)
+
+
+def test_repeatedfit_reuse_nll_constant_parameters():
+    # the constant term optimization of the legacy backend caches the terms which
+    # depend only on constant parameters, so it has to follow changes of them
+    x = ROOT.RooRealVar("x", "x", 0, 10)
+    mean = ROOT.RooRealVar("mean", "mean", 5, 3, 7)
+    sigma = ROOT.RooRealVar("sigma", "sigma", 1, 0.3, 3)
+    tau = ROOT.RooRealVar("tau", "tau", -0.3, -2, 0)
+    tau.setConstant(True)
+    gauss = ROOT.RooGaussian("gauss", "gauss", x, mean, sigma)
+    exponential = ROOT.RooExponential("exponential", "exponential", x, tau)
+    fraction = ROOT.RooRealVar("fraction", "fraction", 0.4, 0, 1)
+    pdf = ROOT.RooAddPdf("pdf", "pdf", [gauss, exponential], [fraction])
+    data = pdf.generate(x, 2000)
+    parameters = pdf.getParameters(data)
+    initial_parameters = parameters.snapshot()
+
+    def before_fit(index, start_values):
+        tau.setVal(-0.1 * (index + 1))
+
+    all_results = []
+    for options in [dict(), dict(reuse_nll=True)]:
+        parameters.assign(initial_parameters)
+        repeated_fit = RepeatedFit(model=pdf, data=data, num_fits=4, random_seed=0)
+        repeated_fit.do_repeated_fit(
+            EvalBackend="legacy", PrintLevel=-1, before_fit=before_fit, **options
+        )
+        all_results.append(repeated_fit.results)
+
+    results, results_reuse = all_results
+    for field in ["status", "min_nll", "values", "errors"]:
+        np.testing.assert_array_equal(results_reuse[field], results[field])
+
+
+def test_repeatedfit_staged():
+    x = ROOT.RooRealVar("x", "x", -5, 5)
+    mean = ROOT.RooRealVar("mean", "mean", 0, -3, 3)
+    sigma = ROOT.RooRealVar("sigma", "sigma", 1, 0.5, 3)
+    pdf = ROOT.RooGaussian("gauss", "gauss", x, mean, sigma)
+    data = pdf.generate(x, 10000)
+
+    repeated_fit = RepeatedFit(model=pdf, data=data, num_fits=10, random_seed=0)
+    repeated_fit.do_staged_fit(promote=0.3, coarse_fraction=0.2, random_seed=0)
+
+    assert len(repeated_fit.coarse_results) == 10
+    assert (repeated_fit.coarse_results["index"] >= 0).all()
+    assert len(repeated_fit.promoted_indices) == 3
+    # the promoted fits are the best coarse fits
+    coarse_nll = repeated_fit.coarse_results["min_nll"]
+    assert (
+        coarse_nll[repeated_fit.promoted_indices].max()
+        <= np.delete(coarse_nll, repeated_fit.promoted_indices).min()
+    )
+    # coarse fits run on the subsample without HESSE, the refits on the full data
+    assert repeated_fit.coarse_fitresults[0].numStatusHistory() == 1
+    assert len(repeated_fit.fitresults) == 3
+    result_best = repeated_fit.get_best_result()
+    assert result_best.numStatusHistory() == 2
+    assert result_best.minNll() > coarse_nll.max()
+    assert round(result_best.floatParsFinal().find("mean").getVal(), 1) == 0.0
+    assert round(result_best.floatParsFinal().find("sigma").getVal(), 1) == 1.0
+
+    repeated_fit.do_staged_fit(promote=2, reuse_nll=True)
+    assert len(repeated_fit.get_succeeded_results()) == 2
+
+
+def test_repeatedfit_performance(tmp_path):
+    import csv
+
+    x = ROOT.RooRealVar("x", "x", -5, 5)
+    mean = ROOT.RooRealVar("mean", "mean", 0, -3, 3)
+    sigma = ROOT.RooRealVar("sigma", "sigma", 1, 0.5, 3)
+    pdf = ROOT.RooGaussian("gauss", "gauss", x, mean, sigma)
+    data = pdf.generate(x, 1000)
+
+    calls = []
+    repeated_fit = RepeatedFit(model=pdf, data=data, num_fits=4, random_seed=0)
+    repeated_fit.do_repeated_fit(
+        reuse_nll=True,
+        before_fit=lambda index, start_values: calls.append(("before", index)),
+        after_fit=lambda index, fitresult, metrics: calls.append(
+            ("after", index, metrics["n_calls"])
+        ),
+    )
+    assert [call[:2] for call in calls] == [
+        (stage, index) for index in range(4) for stage in ["before", "after"]
+    ]
+
+    performance = repeated_fit.performance
+    assert (performance["index"] == np.arange(4)).all()
+    assert (performance["wall_time"] > 0).all()
+    assert (performance["n_calls"] > 0).all()
+    assert (
+        performance["setup_time"] + performance["minimization_time"]
+        <= performance["wall_time"] + 1e-3
+    ).all()
+    # the NLL is only created for the first fit
+    assert performance["setup_time"][0] > performance["setup_time"][1:].max()
+    assert performance["status_history"][0] == "MINIMIZE=0 HESSE=0"
+
+    summary = repeated_fit.get_performance_summary()
+    assert summary["num_fits"] == 4
+    assert summary["total_n_calls"] == performance["n_calls"].sum()
+    np.testing.assert_allclose(
+        summary["total_wall_time"], performance["wall_time"].sum()
+    )
+
+    repeated_fit.export_performance(tmp_path / "performance.csv")
+    with open(tmp_path / "performance.csv") as file:
+        rows = list(csv.DictReader(file))
+    assert len(rows) == 4
+    assert int(rows[2]["n_calls"]) == performance["n_calls"][2]
+
+    # without reuse_nll only the total times are measured
+    repeated_fit.do_repeated_fit(n_workers=2)
+    performance = repeated_fit.performance
+    assert (performance["cpu_time"] > 0).all()
+    assert np.isnan(performance["setup_time"]).all()
+    assert (performance["n_calls"] == -1).all()
+
+    # parallel with stopping: after_fit is called only for the fits run
+    from src.data_analysis_helper.root import StoppingPolicy
+
+    calls = []
+    repeated_fit = RepeatedFit(model=pdf, data=data, num_fits=20, random_seed=0)
+    repeated_fit.do_repeated_fit(
+        n_workers=2,
+        stopping=StoppingPolicy(reproduce=2),
+        after_fit=lambda index, fitresult, metrics: calls.append(index),
+    )
+    done = np.flatnonzero(repeated_fit.performance["index"] >= 0)
+    assert repeated_fit.stop_reason is not None
+    assert len(done) < 20
+    assert sorted(calls) == done.tolist()
+
+    # the fits run in the workers, so before_fit cannot be called before them
+    with pytest.raises(ValueError, match="before_fit"):
+        repeated_fit.do_repeated_fit(
+            n_workers=2, before_fit=lambda index, start_values: None
+        )
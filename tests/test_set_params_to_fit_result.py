@@ -109,3 +109,33 @@ def test_set_params_to_fit_result():
         pdf.getVariables().find("sigma").getError()
         != result_best.floatParsFinal().find("sigma").getError()
     )
+
+
+def test_set_params_to_fit_result_workspace(capsys):
+    workspace = ROOT.RooWorkspace("w", "w")
+    x = ROOT.RooRealVar("x", "x", -5, 5)
+    mean = ROOT.RooRealVar("mean", "mean", 0, -3, 3)
+    sigma = ROOT.RooRealVar("sigma", "sigma", 1, 0.5, 3)
+    sigma.setConstant(True)
+    workspace.Import(ROOT.RooGaussian("gauss", "gauss", x, mean, sigma))
+    pdf = workspace.pdf("gauss")
+    data = pdf.generate(workspace.var("x"), 1000)
+    fitresult = pdf.fitTo(data, Save=True, PrintLevel=-1)
+
+    workspace2 = ROOT.RooWorkspace("w2", "w2")
+    workspace2.Import(ROOT.RooGaussian("gauss", "gauss", x, mean, sigma))
+    workspace2.var("mean").setVal(2)
+    workspace2.var("sigma").setVal(2)
+    capsys.readouterr()
+
+    # silent unless verbose
+    set_params_to_fit_result(workspace2, fitresult)
+    assert capsys.readouterr().out == ""
+    assert workspace2.var("mean").getVal() == fitresult.floatParsFinal()[0].getVal()
+    assert workspace2.var("mean").getError() == fitresult.floatParsFinal()[0].getError()
+    assert workspace2.var("sigma").getVal() == 1
+
+    workspace2.var("sigma").setVal(2)
+    set_params_to_fit_result(workspace2.allVars(), fitresult, verbose=True)
+    assert workspace2.var("sigma").getVal() == 1
+    assert "x not found in fit result" in capsys.readouterr().out